@@ -1,112 +1,145 @@
 """Module containing classes used to query Opsgenie APIs"""
+import itertools
 import logging
+from typing import List, Optional
 from urllib import parse
 
-import requests
-
 from . import resource, tool
 
-#logger = logging.getLogger('popsgenie')
+# Opsgenie list endpoints: identifier types each accepts
+# and the Popsgenie class representing its resources
+_ENDPOINTS = {
+    'alerts': (('id', 'name'), resource.Alert),
+    'escalations': (('id', 'name'), resource.Escalation),
+    'incidents': (('id', 'name'), resource.Incident),
+    'schedules': (('id', 'name'), resource.Schedule),
+    'teams': (('id', 'name'), resource.Team),
+    'users': (('id', 'username'), resource.User),
+}
+
+# Characters parse.quote leaves as they are
+_UNQUOTED = frozenset(
+    'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.-~/')
+
+# Most results Opsgenie returns from a list query in one page
+_LIST_LIMIT = 100
 
 
 class Popsgenie():
     """Class for querying Opsgenie at API level"""
     logger = logging.getLogger(__name__)
 
-    def __init__(self, api_key: str, opsgenie_url: str = 'https://api.opsgenie.com/v2'):
-        session = requests.Session()
-        session.headers.update(
-            {"Authorization": api_key}
-        )
+    def __init__(
+            self,
+            api_key: str,
+            opsgenie_url: str = 'https://api.opsgenie.com/v2',
+            http_cache: bool = False,
+            cache_ttl: float = 0):
+        """Set up a session for querying Opsgenie
 
-        self.connection = tool.Connection(session=session, url_base=opsgenie_url)
+        Args:
+            api_key (str): Opsgenie API key sent in the Authorization header
+            opsgenie_url (str, optional): Opsgenie's API url.
+                Defaults to 'https://api.opsgenie.com/v2'.
+            http_cache (bool, optional): keep an in-memory HTTP cache so repeated
+                GETs are revalidated (ETag/If-None-Match) instead of re-downloaded.
+                Requires the cachecontrol package. Defaults to False.
+            cache_ttl (float, optional): seconds a resource's data is reused before
+                Opsgenie is queried again. Defaults to 0, always query.
+        """
+        session = tool.make_session(api_key, http_cache=http_cache)
 
-    def alerts(
+        self.connection = tool.Connection(
+            session=session, url_base=opsgenie_url, cache_ttl=cache_ttl)
+
+        # list urls don't change, build them once
+        self._urls = {
+            endpoint: f"{opsgenie_url}/{endpoint}"
+            for endpoint in _ENDPOINTS}
+
+    def _list( # pylint: disable=too-many-arguments
             self,
-            identifier: str = None,
-            identifier_type: str = None,
-            offset: int = 0,
-            limit: int = 20) -> tool.Pages:
-        """List opsgenie alerts in the form of Alert objects
+            endpoint: str,
+            identifier: Optional[str],
+            identifier_type: Optional[str],
+            offset: int,
+            limit: int,
+            *,
+            prefetch: bool = False,
+            parallel: bool = False,
+            url_base: Optional[str] = None) -> tool.Pages:
+        """Shared body of the list methods
 
         Args:
-            identifier (str, optional): The name or id of a alert. Defaults to None.
-            identifier_type (str, optional): The type of identifier used.
-                Values are either 'name' or 'id'. Defaults to None.
-            offset (int, optional): offset for pagination. Defaults to 0.
-            limit (int, optional): limit for pagination. Defaults to 20.
+            endpoint (str): key of the resource's list endpoint in _ENDPOINTS
+            url_base (str, optional): Opsgenie API url the endpoint lives under.
+                Defaults to the connection's url_base.
+
+            All other arguments are described by the public list methods.
 
         Returns:
-            page.PopsgeniePage: iterable that returns lists of Alert objects
+            tool.Pages: iterable that returns lists of the endpoint's Popsgenie objects
         """
-        url_parts = [self.connection.url_base, "alerts"]
+        identifier_types, api_class = _ENDPOINTS[endpoint]
+        url = f"{url_base}/{endpoint}" if url_base else self._urls[endpoint]
+
         parameters: dict = {
             "offset": offset,
             "limit": limit}
 
-        if identifier_type in ['id', 'name']:
+        if identifier_type in identifier_types:
             parameters['identifierType'] = identifier_type
         if identifier:
-            url_parts.append(parse.quote(identifier))
-
-        query_string = parse.urlencode(parameters)
-
-        url = "/".join(url_parts)
-        url = url + '?' + query_string
+            # ids are uuids, which never need quoting
+            if not _UNQUOTED.issuperset(identifier):
+                identifier = parse.quote(identifier)
+            url = f"{url}/{identifier}"
 
         pages = tool.Pages(
             connection=self.connection,
             url=url,
-            PopsgenieClass=resource.Alert)
+            params=parameters,
+            prefetch=prefetch,
+            parallel=parallel,
+            PopsgenieClass=api_class)
 
         return pages
 
-    def escalations(
+    def alerts(
             self,
             identifier: str = None,
             identifier_type: str = None,
             offset: int = 0,
-            limit: int = 20) -> tool.Pages:
-        """List opsgenie escalations in the form of Escalation objects
+            limit: int = 20,
+            *,
+            parallel: bool = False) -> tool.Pages:
+        """List opsgenie alerts in the form of Alert objects
 
         Args:
-            identifier (str, optional): The name or id of a escalation. Defaults to None.
+            identifier (str, optional): The name or id of a alert. Defaults to None.
             identifier_type (str, optional): The type of identifier used.
                 Values are either 'name' or 'id'. Defaults to None.
             offset (int, optional): offset for pagination. Defaults to 0.
             limit (int, optional): limit for pagination. Defaults to 20.
+            parallel (bool, optional): once the first page tells us where the last
+                page is, request the remaining pages concurrently. Defaults to False.
 
         Returns:
-            page.PopsgeniePage: iterable that returns lists of Escalation objects
+            page.PopsgeniePage: iterable that returns lists of Alert objects
         """
-        url_parts = [self.connection.url_base, "escalations"]
-        parameters: dict = {
-            "offset": offset,
-            "limit": limit}
+        return self._list(
+            "alerts",
+            identifier, identifier_type, offset, limit,
+            parallel=parallel)
 
-        if identifier_type in ['id', 'name']:
-            parameters['identifierType'] = identifier_type
-        if identifier:
-            url_parts.append(parse.quote(identifier))
-
-        query_string = parse.urlencode(parameters)
-
-        url = "/".join(url_parts)
-        url = url + '?' + query_string
-
-        pages = tool.Pages(
-            connection=self.connection,
-            url=url,
-            PopsgenieClass=resource.Escalation)
-
-        return pages
-
-    def incidents(
+    def escalations(
             self,
             identifier: str = None,
             identifier_type: str = None,
             offset: int = 0,
-            limit: int = 20) -> tool.Pages:
+            limit: int = 20,
+            *,
+            parallel: bool = False) -> tool.Pages:
         """List opsgenie escalations in the form of Escalation objects
 
         Args:
@@ -115,38 +148,54 @@ class Popsgenie():
                 Values are either 'name' or 'id'. Defaults to None.
             offset (int, optional): offset for pagination. Defaults to 0.
             limit (int, optional): limit for pagination. Defaults to 20.
+            parallel (bool, optional): once the first page tells us where the last
+                page is, request the remaining pages concurrently. Defaults to False.
 
         Returns:
             page.PopsgeniePage: iterable that returns lists of Escalation objects
         """
-        url_parts = ["https://api.opsgenie.com/v1/incidents"]
-        parameters: dict = {
-            "offset": offset,
-            "limit": limit}
-
-        if identifier_type in ['id', 'name']:
-            parameters['identifierType'] = identifier_type
-        if identifier:
-            url_parts.append(parse.quote(identifier))
-
-        query_string = parse.urlencode(parameters)
+        return self._list(
+            "escalations",
+            identifier, identifier_type, offset, limit,
+            parallel=parallel)
 
-        url = "/".join(url_parts)
-        url = url + '?' + query_string
+    def incidents(
+            self,
+            identifier: str = None,
+            identifier_type: str = None,
+            offset: int = 0,
+            limit: int = 20,
+            *,
+            parallel: bool = False) -> tool.Pages:
+        """List opsgenie incidents in the form of Incident objects
 
-        pages = tool.Pages(
-            connection=self.connection,
-            url=url,
-            PopsgenieClass=resource.Incident)
+        Args:
+            identifier (str, optional): The name or id of a incident. Defaults to None.
+            identifier_type (str, optional): The type of identifier used.
+                Values are either 'name' or 'id'. Defaults to None.
+            offset (int, optional): offset for pagination. Defaults to 0.
+            limit (int, optional): limit for pagination. Defaults to 20.
+            parallel (bool, optional): once the first page tells us where the last
+                page is, request the remaining pages concurrently. Defaults to False.
 
-        return pages
+        Returns:
+            page.PopsgeniePage: iterable that returns lists of Incident objects
+        """
+        return self._list(
+            "incidents",
+            identifier, identifier_type, offset, limit,
+            parallel=parallel,
+            url_base="https://api.opsgenie.com/v1")
 
-    def schedules(
+    def schedules( # pylint: disable=too-many-arguments
             self,
             identifier: str = None,
             identifier_type: str = None,
             offset: int = 0,
-            limit: int = 20) -> tool.Pages:
+            limit: int = 20,
+            *,
+            prefetch: bool = False,
+            parallel: bool = False) -> tool.Pages:
         """List opsgenie schedules in the form of Schedule objects
 
         Args:
@@ -155,38 +204,29 @@ class Popsgenie():
                 Values are either 'name' or 'id'. Defaults to None.
             offset (int, optional): offset for pagination. Defaults to 0.
             limit (int, optional): limit for pagination. Defaults to 20.
+            prefetch (bool, optional): query each object's attributes, concurrently,
+                as its page is fetched. Defaults to False.
+            parallel (bool, optional): once the first page tells us where the last
+                page is, request the remaining pages concurrently. Defaults to False.
 
         Returns:
             page.PopsgeniePage: iterable that returns lists of Schedule objects
         """
-        url_parts = [self.connection.url_base, "schedules"]
-        parameters: dict = {
-            "offset": offset,
-            "limit": limit}
-
-        if identifier_type in ['id', 'name']:
-            parameters['identifierType'] = identifier_type
-        if identifier:
-            url_parts.append(parse.quote(identifier))
-
-        query_string = parse.urlencode(parameters)
-
-        url = "/".join(url_parts)
-        url = url + '?' + query_string
-
-        pages = tool.Pages(
-            connection=self.connection,
-            url=url,
-            PopsgenieClass=resource.Schedule)
+        return self._list(
+            "schedules",
+            identifier, identifier_type, offset, limit,
+            prefetch=prefetch,
+            parallel=parallel)
 
-        return pages
-
-    def teams(
+    def teams( # pylint: disable=too-many-arguments
             self,
             identifier: str = None,
             identifier_type: str = None,
             offset: int = 0,
-            limit: int = 20) -> tool.Pages:
+            limit: int = 20,
+            *,
+            prefetch: bool = False,
+            parallel: bool = False) -> tool.Pages:
         """List opsgenie teams in the form of Team objects
 
         Args:
@@ -195,38 +235,29 @@ class Popsgenie():
                 Values are either 'name' or 'id'. Defaults to None.
             offset (int, optional): offset for pagination. Defaults to 0.
             limit (int, optional): limit for pagination. Defaults to 20.
+            prefetch (bool, optional): query each object's attributes, concurrently,
+                as its page is fetched. Defaults to False.
+            parallel (bool, optional): once the first page tells us where the last
+                page is, request the remaining pages concurrently. Defaults to False.
 
         Returns:
             page.PopsgeniePage: iterable that returns lists of Team objects
         """
-        url_parts = [self.connection.url_base, "teams"]
-        parameters: dict = {
-            "offset": offset,
-            "limit": limit}
-
-        if identifier_type in ['id', 'name']:
-            parameters['identifierType'] = identifier_type
-        if identifier:
-            url_parts.append(parse.quote(identifier))
-
-        query_string = parse.urlencode(parameters)
-
-        url = "/".join(url_parts)
-        url = url + '?' + query_string
-
-        pages = tool.Pages(
-            connection=self.connection,
-            url=url,
-            PopsgenieClass=resource.Team)
-
-        return pages
+        return self._list(
+            "teams",
+            identifier, identifier_type, offset, limit,
+            prefetch=prefetch,
+            parallel=parallel)
 
-    def users(
+    def users( # pylint: disable=too-many-arguments
             self,
             identifier: str = None,
             identifier_type: str = None,
             offset: int = 0,
-            limit: int = 20) -> tool.Pages:
+            limit: int = 20,
+            *,
+            prefetch: bool = False,
+            parallel: bool = False) -> tool.Pages:
         """List opsgenie users in the form of User objects
 
         Args:
@@ -235,28 +266,120 @@ class Popsgenie():
                 Values are either 'username' or 'id'. Defaults to None.
             offset (int, optional): offset for pagination. Defaults to 0.
             limit (int, optional): limit for pagination. Defaults to 20.
+            prefetch (bool, optional): query each object's attributes, concurrently,
+                as its page is fetched. Defaults to False.
+            parallel (bool, optional): once the first page tells us where the last
+                page is, request the remaining pages concurrently. Defaults to False.
 
         Returns:
             page.PopsgeniePage: iterable that returns lists of User objects
         """
-        url_parts = [self.connection.url_base, "users"]
-        parameters: dict = {
-            "offset": offset,
-            "limit": limit}
+        return self._list(
+            "users",
+            identifier, identifier_type, offset, limit,
+            prefetch=prefetch,
+            parallel=parallel)
 
-        if identifier_type in ['id', 'username']:
-            parameters['identifierType'] = identifier_type
-        if identifier:
-            url_parts.append(parse.quote(identifier))
+    def batch_load_users(
+            self,
+            ids: List[str],
+            expand: Optional[str] = 'contact') -> List[resource.User]:
+        """Load many users, by id, with one list query rather than
+        a query per user
 
-        query_string = parse.urlencode(parameters)
+        Args:
+            ids (List[str]): ids of the users to load
+            expand (str, optional): related data Opsgenie includes with each user.
+                Defaults to 'contact'; None leaves it out.
 
-        url = "/".join(url_parts)
-        url = url + '?' + query_string
+        Returns:
+            List[resource.User]: users found in Opsgenie
+        """
+        if not ids:
+            return []
+
+        # Opsgenie caps limit; Pages follows paging.next for the rest
+        parameters: dict = {
+            "query": f"id:({' OR '.join(ids)})",
+            "limit": min(len(ids), _LIST_LIMIT)}
+
+        if expand:
+            parameters['expand'] = expand
 
         pages = tool.Pages(
             connection=self.connection,
-            url=url,
+            url=self._urls['users'],
+            params=parameters,
             PopsgenieClass=resource.User)
 
-        return pages
+        users = list(itertools.chain.from_iterable(pages))
+
+        return users
+
+    def _get(self, endpoint: str, ids: List[str], max_workers: int) -> list:
+        """Shared body of the get methods
+
+        Args:
+            endpoint (str): key of the resource's list endpoint in _ENDPOINTS
+
+            All other arguments are described by the public get methods.
+
+        Returns:
+            list: the endpoint's Popsgenie objects, in the order of ids
+        """
+        _, api_class = _ENDPOINTS[endpoint]
+
+        # Teams and users are shared with the rest of the connection's resources
+        if api_class in (resource.Team, resource.User):
+            api_objects = [
+                resource._shared(api_class, self.connection, {'id': api_id}) # pylint: disable=protected-access
+                for api_id in ids]
+        else:
+            api_objects = [api_class(self.connection, id=api_id) for api_id in ids]
+
+        # a shared object may already be queried, or appear more than once
+        unqueried = {
+            id(api_object): api_object
+            for api_object in api_objects
+            if not api_object._queried} # pylint: disable=protected-access
+
+        tool.hydrate(list(unqueried.values()), max_workers=max_workers)
+
+        return api_objects
+
+    def get_schedules(self, ids: List[str], max_workers: int = 16) -> List[resource.Schedule]:
+        """Get many schedules, by id, with concurrent requests
+
+        Args:
+            ids (List[str]): ids of the schedules to get
+            max_workers (int, optional): number of concurrent requests. Defaults to 16.
+
+        Returns:
+            List[resource.Schedule]: schedules in the order of ids
+        """
+        return self._get("schedules", ids, max_workers)
+
+    def get_teams(self, ids: List[str], max_workers: int = 16) -> List[resource.Team]:
+        """Get many teams, by id, with concurrent requests
+
+        Args:
+            ids (List[str]): ids of the teams to get
+            max_workers (int, optional): number of concurrent requests. Defaults to 16.
+
+        Returns:
+            List[resource.Team]: teams in the order of ids
+        """
+        return self._get("teams", ids, max_workers)
+
+    def get_users(self, ids: List[str], max_workers: int = 16) -> List[resource.User]:
+        """Get many users, by id, with concurrent requests.
+        Unlike batch_load_users each user's full data is returned.
+
+        Args:
+            ids (List[str]): ids of the users to get
+            max_workers (int, optional): number of concurrent requests. Defaults to 16.
+
+        Returns:
+            List[resource.User]: users in the order of ids
+        """
+        return self._get("users", ids, max_workers)
@@ -1,23 +1,50 @@
 """Represent data in Opsgenie with Popsgenie Classes"""
 from abc import ABC
 import datetime
+import functools
 import logging
-from typing import Dict, List, Optional, TYPE_CHECKING, Union
+from typing import Dict, FrozenSet, List, Optional, Union
 
-if TYPE_CHECKING:
-    import tool
+from . import tool
+
+try:
+    import ciso8601
+except ImportError:
+    ciso8601 = None
+
+
+class _CachedQuery(functools.cached_property): # pylint: disable=too-few-public-methods
+    """cached_property for properties that query Opsgenie.
+
+    Before python 3.12 cached_property holds one lock, per property, across
+    every instance while its getter runs, so threads reading e.g. on_calls
+    on different schedules would wait on each other's requests. Without the
+    lock two threads reading the same instance at once may both query.
+    """
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        value = self.func(instance)
+        # shadows this descriptor, like cached_property, so it runs once
+        instance.__dict__[self.attrname] = value
+
+        return value
 
 
 class Base(ABC):
     """Base class used to represent resources returned
     by the Opsgenie API https://docs.opsgenie.com/docs/api-overview
-    At a minimum each subclass is required to implement
-    self.lookup_attributes and skip_attributes as empty lists.
+    Subclasses override the class level lookup_attributes
+    and skip_attributes frozensets, which default to empty.
     The subclass's attributes reflect the resource's fields returned by
     Opsgenie *except* when the attribute is included in skip_attributes.
     If on initialization an instance of a subclass did not recieve data, for an attribute,
-    data will be queried if the attribute's name is included in self.lookup_attributes.
+    data will be queried if the attribute's name is included in lookup_attributes.
     """
+    lookup_attributes: FrozenSet[str] = frozenset()
+    skip_attributes: FrozenSet[str] = frozenset()
+
     def __init__(
             self,
             connection: 'tool.Connection',
@@ -26,49 +53,67 @@ class Base(ABC):
         """Abstract class for Opsgenie resources
 
         Args:
-            session (requests.sessions.Session): an pre-authorized session object
-            opsgenie_url (str): The base url for Opsgenie (I don't see this ever being required)
-            resource (str, optional): The Opsgenie resource the class is representing.
+            connection (tool.Connection): the pre-authorized session, shared by every
+                resource so its pooled connections are reused, and the base url for Opsgenie
+            resource_name (str, optional): The Opsgenie resource the class is representing.
                 If the default value (None) is used an instance will throw an error if a resource is
                 queried. In this case an instance of the class should contain all required data.
                 Defaults to None.
 
             All other key word arguments are used to generate an instance's attributes.
-
-        Raises:
-            AttributeError: thrown when an attribute already exists and cannot be
-                added during instance init.
         """
         self.connection = connection
-        self.__resource_name: Optional[str] = resource_name
-
+        self._resource_name: Optional[str] = resource_name
+        self._resource_url: Optional[str] = None
+        if resource_name and 'id' in kwargs:
+            self._resource_url = f"{connection.url_base}/{resource_name}/{kwargs['id']}"
+        # set once Opsgenie has been queried for the resource's data
+        self._queried = False
 
         # keep an updated list of object's attributes
-        # this can get updated after a web request
+        # this can get updated after a web request.
+        # Fields are copied onto the instance as they're first read
         self._context = kwargs
 
-        for key, value in kwargs.items():
-            try:
-                setattr(self, key, value)
-            except AttributeError as error:
-                if key in dir(self):
-                    pass
-                else:
-                    raise AttributeError(f"{error}: {key}")
-
     def __repr__(self):
         return "%s(%r)" % (self.__class__, self.id)
 
     def __getattr__(self, key: str):
-        """Some attributes are pre-set when the object is instantiated.
+        """Fields are read from self._context, and kept on the instance,
+        the first time they're accessed rather than copied on initialization.
         Others aren't available on initialization and require a query.
         This method allows us to query only when the attribute is required.
         In some cases this can save us a web request.
+
+        Only names in lookup_attributes trigger a query, and only until
+        the resource has been queried once; Opsgenie omits empty fields
+        so asking again wouldn't find them. Any other missing attribute
+        raises AttributeError straight away.
         """
-        if key in self.lookup_attributes:
+        if key in self.skip_attributes:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{key}'")
+
+        # __dict__ rather than attributes so a half built instance,
+        # e.g. one being copied, can't recurse back in here
+        instance = self.__dict__
+        context = instance.get('_context', {})
+
+        if key not in context:
+            if key not in self.lookup_attributes or instance.get('_queried', True):
+                raise AttributeError(
+                    f"'{type(self).__name__}' object has no attribute '{key}'")
+
             self.query_attributes(self.resource_url())
+            context = self._context
+
+            if key not in context:
+                raise AttributeError(
+                    f"'{type(self).__name__}' object has no attribute '{key}'")
+
+        value = instance[key] = context[key]
 
-        return self.__getattribute__(key)
+        return value
 
     def query_attributes(self, context_url: str, **kwargs):
         """Used for importing data from Opsgenie to set an object's
@@ -77,28 +122,31 @@ class Base(ABC):
         Args:
             context_url (str): The Opsgenie API endpoint used
                 to query data.
-
-        Raises:
-            AttributeError: If unable to set an attribute
-                (more than likely because it exists as a property)
-                throw the underlying error.
         """
         self.logger.debug("url=%s", context_url)
 
-        response = self.connection.session.get(context_url, **kwargs)
-        json = response.json()
+        data = self.connection.get_json(context_url, **kwargs)['data']
 
         # Update our context with the latest information
-        self._context = json['data']
+        self._context = {**self._context, **data}
+        self._queried = True
+
+        self._refresh_attributes(data)
 
-        for key, value in json['data'].items():
-            try:
-                setattr(self, key, value)
-            except AttributeError as error:
-                if key in dir(self):
-                    pass
-                else:
-                    raise AttributeError(f"{error}: {key}")
+    def _refresh_attributes(self, data: dict):
+        """Update the fields already read onto the instance, in a single
+        dict update; the rest are read from self._context when accessed.
+        Fields in skip_attributes are left to their properties.
+
+        Args:
+            data (dict): fields returned by Opsgenie
+        """
+        instance = self.__dict__
+        skip_attributes = self.skip_attributes
+
+        instance.update(
+            (key, value) for key, value in data.items()
+            if key in instance and key not in skip_attributes)
 
     def resource_url(self) -> str:
         """String declaring the resource's API endpoing
@@ -106,10 +154,14 @@ class Base(ABC):
         Returns:
             str: value suitable for querying resource data
         """
-        url = "/".join(
-            [self.connection.url_base, self.__resource_name, self.id]) # type: ignore
+        # built on initialization unless the resource was created without an id
+        if self._resource_url is None:
+            if self._resource_name is None:
+                raise TypeError(f"{type(self).__name__} has no resource name to query")
 
-        return url
+            self._resource_url = f"{self.connection.url_base}/{self._resource_name}/{self.id}"
+
+        return self._resource_url
 
 
 class Alert(Base):
@@ -118,15 +170,13 @@ class Alert(Base):
     """
     logger = logging.getLogger(__name__)
     resource_name = 'alerts'
+    lookup_attributes: FrozenSet[str] = frozenset(['responders'])
+    skip_attributes: FrozenSet[str] = frozenset(['responders'])
 
     def __init__(self, *args, **kwargs):
-        self.__responders: Optional[List[Union['Schedule', 'Team', 'User', dict]]] = None
-
-        self.lookup_attributes = ['responders']
-
         super().__init__(*args, resource_name=self.resource_name, **kwargs)
 
-    @property
+    @functools.cached_property
     def responders(self) -> List[Union['Schedule', 'Team', 'User', dict]]:
         """Teams, users, escalations and schedules
         that the alert will be routed to send notifications.
@@ -135,31 +185,22 @@ class Alert(Base):
             List[Union['Schedule', 'Team', 'User', dict]]: A list of Popsgenie resources
                 or a dict if responder is of type escalation
         """
-        if self.__responders is None:
-            self.__responders = []
+        responders: List[Union['Schedule', 'Team', 'User', dict]] = []
 
-            for responder in self._context.get('responders', []):
-                if responder['type'] == 'user':
-                    responder.pop("type")
+        for responder in self._context.get('responders', []):
+            resource_class = _RESOURCE_CLASSES.get(responder['type'])
 
-                    self.__responders.append(
-                        User(self.connection, **responder))
-                elif responder['type'] == 'team':
-                    responder.pop("type")
+            if resource_class is None:
+                # Haven't witnessed responder['type'] == [escalation]
+                # For now, I have to punt and return the dict
+                responders.append(responder)
+            else:
+                responder.pop("type")
 
-                    self.__responders.append(
-                        Team(self.connection, **responder))
-                elif responder['type'] == 'schedule':
-                    responder.pop("type")
+                responders.append(
+                    resource_class(self.connection, **responder))
 
-                    self.__responders.append(
-                        Schedule(self.connection, **responder))
-                else:
-                    # Haven't witnessed responder['type'] == [escalation]
-                    # For now, I have to punt and return the dict
-                    self.__responders.append(responder)
-
-        return self.__responders
+        return responders
 
 
 class Escalation(Base):
@@ -168,19 +209,16 @@ class Escalation(Base):
     """
     logger = logging.getLogger(__name__)
     resource_name = 'escalations'
+    lookup_attributes: FrozenSet[str] = frozenset([
+        'name',
+        'description',
+    ])
+    skip_attributes: FrozenSet[str] = frozenset(['rules'])
 
     def __init__(self, *args, **kwargs):
-        self.__rules: List[dict] = None
-        self.__owner_team = None
-
-        self.lookup_attributes = [
-            'name',
-            'description',
-        ]
-
         super().__init__(*args, resource_name=self.resource_name, **kwargs)
 
-    @property
+    @functools.cached_property
     def rules(self) -> List[dict]:
         """Dictionary of data describing an escalation's rules.
         rule's recipient is replaced with a corresponding Popsgenie resource
@@ -188,45 +226,34 @@ class Escalation(Base):
         Returns:
             List[dict]: dictionary describing Opsgenie rules
         """
-        if self.__rules is None:
-            self.__rules = []
-
-            for rule in self._context.get('rules', {}):
-                if rule['recipient']['type'] == 'schedule':
-                    rule['recipient'].pop("type")
-
-                    rule['recipient'] = Schedule(self.connection, **rule['recipient'])
-
-                    self.__rules.append(rule)
-                elif rule['recipient']['type'] == 'user':
-                    rule['recipient'].pop("type")
+        rules: List[dict] = []
 
-                    rule['recipient'] = User(self.connection, **rule['recipient'])
+        for rule in self._context.get('rules', {}):
+            resource_class = _RESOURCE_CLASSES.get(rule['recipient']['type'])
 
-                    self.__rules.append(rule)
-                elif rule['recipient']['type'] == 'team':
-                    rule['recipient'].pop("type")
+            # For now, I have to punt and leave other recipients as a dict
+            if resource_class is not None:
+                rule['recipient'].pop("type")
 
-                    rule['recipient'] = Team(self.connection, **rule['recipient'])
+                rule['recipient'] = resource_class(self.connection, **rule['recipient'])
 
-                    self.__rules.append(rule)
-                else:
-                    # For now, I have to punt and return the dict
-                    self.__rules.append(rule)
+            rules.append(rule)
 
-        return self.__rules
+        return rules
 
-    @property
-    def owner_team(self) -> 'Team':
+    @functools.cached_property
+    def owner_team(self) -> Optional['Team']:
         """Property representing a escalation's owning team
 
         Returns:
             [Team]: A team owning the escalation policy
         """
-        if self.__owner_team is None and self._context.get('ownerTeam'):
-            self.__owner_team = Team(self.connection, **self._context['ownerTeam'])
+        owner_team = None
 
-        return self.__owner_team
+        if self._context.get('ownerTeam'):
+            owner_team = Team(self.connection, **self._context['ownerTeam'])
+
+        return owner_team
 
 
 class Incident(Base):
@@ -236,35 +263,29 @@ class Incident(Base):
     This class makes no external queries
     """
     logger = logging.getLogger(__name__)
+    lookup_attributes: FrozenSet[str] = frozenset()
+    skip_attributes: FrozenSet[str] = frozenset(['responders'])
 
-    def __init__(self, *args, **kwargs):
-        self.__responders: Optional[List[Union['User', 'Team']]] = None
-
-        super().__init__(*args, **kwargs)
-
-    @property
+    @functools.cached_property
     def responders(self) -> List[Union['User', 'Team']]:
         """Users, teams that the incident will be routed to send notifications.
 
         Returns:
             List[Union['User', 'Team']]: A list of Popsgenie resources
         """
-        if self.__responders is None:
-            self.__responders = []
+        responders: List[Union['User', 'Team']] = []
 
-            for responder in self._context.get('responders', []):
-                if responder['type'] == 'user':
-                    responder.pop("type")
+        for responder in self._context.get('responders', []):
+            resource_class = _RESOURCE_CLASSES.get(responder['type'])
 
-                    self.__responders.append(
-                        User(self.connection, **responder))
-                elif responder['type'] == 'team':
-                    responder.pop("type")
+            # Incidents are only routed to users and teams
+            if resource_class in (User, Team):
+                responder.pop("type")
 
-                    self.__responders.append(
-                        Team(self.connection, **responder))
+                responders.append(
+                    resource_class(self.connection, **responder))
 
-        return self.__responders
+        return responders
 
 
 class Rotation(Base):
@@ -274,15 +295,10 @@ class Rotation(Base):
     This class makes no external queries
     """
     logger = logging.getLogger(__name__)
+    lookup_attributes: FrozenSet[str] = frozenset()
+    skip_attributes: FrozenSet[str] = frozenset(['participants'])
 
-    def __init__(self, *args, **kwargs):
-        self.__participants: Optional[List[Union['Team', 'User', dict]]] = None
-        self.lookup_attributes = []
-        self.skip_attributes = ['participants']
-
-        super().__init__(*args, **kwargs)
-
-    @property
+    @functools.cached_property
     def participants(self) -> List[Union['Team', 'User', dict]]:
         """Retrive a list of Opsgenie Users associated
         with the rotation
@@ -291,22 +307,20 @@ class Rotation(Base):
             List[User]: List containing Opsgenie
             users
         """
-        if self.__participants is None:
-            self.__participants = []
+        participants: List[Union['Team', 'User', dict]] = []
+
+        for participant in self._context.get('participants', []):
+            resource_class = _RESOURCE_CLASSES.get(participant['type'])
 
-            for participant in self._context.get('participants', []):
-                if participant['type'] == 'user':
-                    self.__participants.append(
-                        User(self.connection, **participant))
-                elif participant['type'] == 'team':
-                    self.__participants.append(
-                        Team(self.connection, **participant))
-                else:
-                    # Haven't witnessed participant['type'] == [escalation | none]
-                    # For now, I have to punt and return the dict
-                    self.__participants.append(participant)
+            if resource_class in (User, Team):
+                participants.append(
+                    _shared(resource_class, self.connection, participant))
+            else:
+                # Haven't witnessed participant['type'] == [escalation | none]
+                # For now, I have to punt and return the dict
+                participants.append(participant)
 
-        return self.__participants
+        return participants
 
 
 class Schedule(Base):
@@ -315,23 +329,19 @@ class Schedule(Base):
     """
     logger = logging.getLogger(__name__)
     resource_name = 'schedules'
+    lookup_attributes: FrozenSet[str] = frozenset([
+        'name',
+        'description',
+        'timezone',
+        'enabled',
+        'ownerTeam',
+    ])
+    skip_attributes: FrozenSet[str] = frozenset(['rotations'])
 
     def __init__(self, *args, **kwargs):
-        self.__team: Optional[Team] = None
-        self.__on_calls: Optional[List['User']] = None
-        self.__rotations: Optional[List[Rotation]] = None
-
-        self.lookup_attributes = [
-            'name',
-            'description',
-            'timezone',
-            'enabled',
-            'ownerTeam',
-        ]
-
         super().__init__(*args, resource_name=self.resource_name, **kwargs)
 
-    @property
+    @_CachedQuery
     def rotations(self) -> List['Rotation']:
         """Returns the raw data for a Opsgenie rotation
         associated with a schedule
@@ -339,17 +349,17 @@ class Schedule(Base):
         Returns:
             List[dict]: raw response from Opsgenie
         """
-        if self.__rotations is None:
+        if 'rotations' not in self._context:
             self.query_attributes(self.resource_url())
 
-            self.__rotations = [
-                Rotation(self.connection, **rotation_data)
-                for rotation_data in self._context['rotations']
-            ]
+        rotations = [
+            Rotation(self.connection, **rotation_data)
+            for rotation_data in self._context['rotations']
+        ]
 
-        return self.__rotations
+        return rotations
 
-    @property
+    @_CachedQuery
     def team(self) -> 'Team':
         """Query Opsgenie for the team associated with a
         schedule and convert raw data to Team
@@ -358,39 +368,69 @@ class Schedule(Base):
             Team: an object representing a Team
                 in Opsgenie
         """
-        if self.__team is None:
-            url = "/".join(
-                [self.connection.url_base, "teams", self.ownerTeam['id']]
-            )
+        team_id = self.ownerTeam['id']
 
-            self.logger.debug("url=%s", url)
+        # Schedules owned by the same team share it rather than query it again
+        team = self.connection.teams.get(team_id)
+        if team is None:
+            team = Team(self.connection, id=team_id)
+            self.connection.teams[team_id] = team
 
-            response = self.connection.session.get(url)
-            self.__team = Team(self.connection, **response.json()['data'])
+        # A team seen only as a reference, e.g. a responder, isn't queried yet
+        if not team._queried: # pylint: disable=protected-access
+            team.query_attributes(team.resource_url())
 
-        return self.__team
+        return team
 
-    @property
+    @_CachedQuery
     def on_calls(self) -> List['User']:
         """Retrieve users on call for a Schedule
 
         Returns:
             List[User]: Users on call in a schedule
         """
-        if self.__on_calls is None:
-            url = "/".join(
-                [self.resource_url(), "on-calls"])
+        url = f"{self.resource_url()}/on-calls"
 
-            self.logger.debug("url=%s", url)
+        self.logger.debug("url=%s", url)
 
-            response = self.connection.session.get(url)
+        data = self.connection.get_json(url)['data']
 
-            self.__on_calls = [
-                User(self.connection, **user_data)
-                for user_data in response.json()['data']['onCallParticipants']
-            ]
+        on_calls = [
+            _shared(User, self.connection, user_data)
+            for user_data in data['onCallParticipants']
+        ]
+
+        return on_calls
+
+    def prefetch_participants(self) -> List['User']:
+        """Query every user taking part in the schedule's rotations at once,
+        rather than a request per user as each one is read
+
+        Returns:
+            List[User]: distinct users across the schedule's rotations
+        """
+        users = list({
+            participant.id: participant
+            for rotation in self.rotations
+            for participant in rotation.participants
+            if isinstance(participant, User)
+        }.values())
 
-        return self.__on_calls
+        # expanded like User.role's query, so reading roles needs no more requests
+        tool.hydrate(users, params={'expand': 'contact'})
+
+        return users
+
+    def hydrate_on_calls(self) -> List['User']:
+        """Query every on call user's attributes at once, rather
+        than a request per user as each one is read
+
+        Returns:
+            List[User]: Users on call in a schedule
+        """
+        tool.hydrate(self.on_calls)
+
+        return self.on_calls
 
 
 class Team(Base):
@@ -399,21 +439,21 @@ class Team(Base):
     """
     logger = logging.getLogger(__name__)
     resource_name = 'teams'
+    lookup_attributes: FrozenSet[str] = frozenset([
+        'name',
+        'description',
+        'links',
+        'members',
+    ])
+    skip_attributes: FrozenSet[str] = frozenset(['members'])
 
     def __init__(self, *args, **kwargs):
-        self.__members: Optional[List['User']] = None
-
-        self.lookup_attributes = [
-            'name',
-            'description',
-            'links',
-            'members',
-        ]
-        self.skip_attributes = ['members']
-
         super().__init__(*args, resource_name=self.resource_name, **kwargs)
 
-    @property
+        # members the user list query behind members didn't return
+        self._unlisted_members: List['User'] = []
+
+    @_CachedQuery
     def members(self) -> List['User']:
         """Retrive a list of Opsgenie Users associated
         with the team
@@ -422,14 +462,58 @@ class Team(Base):
             List[User]: List containing Opsgenie
             users associated with a team
         """
-        if self.__members is None:
+        if 'members' not in self._context:
             self.query_attributes(self.resource_url())
-            self.__members = [
-                User(self.connection, **member['user'])
-                for member in self._context.get('members', [])
-            ]
 
-        return self.__members
+        members = self._context.get('members', [])
+
+        # Members only carry an id and username. Pull the full user
+        # data in one list query so reading a member's attributes
+        # doesn't cost a request per user.
+        users_data: Dict[str, dict] = {}
+        if members:
+            url = f"{self.connection.url_base}/{User.resource_name}"
+
+            self.logger.debug("url=%s", url)
+
+            data = self.connection.get_json(
+                url,
+                params={
+                    'query': f'teams:"{self.name}"',
+                    'limit': len(members)})['data']
+
+            users_data = {
+                user_data['id']: user_data
+                for user_data in data}
+
+        users = [
+            _shared(
+                User,
+                self.connection,
+                users_data.get(member['user']['id'], member['user']))
+            for member in members
+        ]
+
+        # these still only carry an id and username, unless queried elsewhere
+        self._unlisted_members = [
+            user for user in users
+            if user.id not in users_data and not user._queried] # pylint: disable=protected-access
+
+        return users
+
+    def hydrate_members(self) -> List['User']:
+        """Query, at once, the attributes of any member the user
+        list query behind members didn't return
+
+        Returns:
+            List[User]: List containing Opsgenie
+            users associated with a team
+        """
+        members = self.members
+
+        tool.hydrate(self._unlisted_members)
+
+        return members
 
 
 class User(Base):
@@ -438,27 +522,23 @@ class User(Base):
     """
     logger = logging.getLogger(__name__)
     resource_name = 'users'
+    lookup_attributes: FrozenSet[str] = frozenset([
+        'blocked',
+        'createdAt',
+        'details',
+        'fullName',
+        'locale',
+        'timeZone',
+        'userAddress',
+        'username',
+        'verified'
+    ])
+    skip_attributes: FrozenSet[str] = frozenset(['role'])
 
     def __init__(self, *args, **kwargs):
-        self.__role = None
-        self.__contacts: Optional[dict] = None
-
-        self.lookup_attributes = [
-            'blocked',
-            'createdAt',
-            'details',
-            'fullName',
-            'locale',
-            'timeZone',
-            'userAddress',
-            'username',
-            'verified'
-        ]
-        self.skip_attributes = ['role']
-
         super().__init__(*args, resource_name=self.resource_name, **kwargs)
 
-    @property
+    @_CachedQuery
     def role(self) -> Dict[str, str]:
         """Role of usr.
         It may be one of Admin, User or the name of a custom role created.
@@ -466,14 +546,12 @@ class User(Base):
         Returns:
             Dict[str, str]: id and name of the role as keys
         """
-        if self.__role is None:
+        if not self._queried or 'role' not in self._context:
             self.query_attributes(self.resource_url(), params={'expand': 'contact'})
 
-            self.__role = self._context['role']
+        return self._context['role']
 
-        return self.__role
-
-    @property
+    @functools.cached_property
     def date_created(self) -> datetime.datetime:
         """Generate datetime object form createdAt
         field
@@ -482,27 +560,99 @@ class User(Base):
             datetime.datetime: represents when the user
                 was created in Opsgenie
         """
-        date = datetime.datetime.strptime(
-            self.createdAt.replace(
-                'Z',
-                '+0000'),
-            '%Y-%m-%dT%H:%M:%S.%f%z')
+        created_at = self.createdAt
+
+        if ciso8601 is not None:
+            return ciso8601.parse_datetime(created_at)
+
+        # fromisoformat doesn't accept the 'Z' suffix before python 3.11
+        if created_at.endswith('Z'):
+            created_at = created_at[:-1] + '+00:00'
+
+        date = datetime.datetime.fromisoformat(created_at)
 
         return date
 
-    @property
+    @_CachedQuery
     def contacts(self) -> dict:
         """Retrive a user's means of contact
         https://docs.opsgenie.com/docs/contact-api#list-contacts
         """
-        if self.__contacts is None:
-            url = "/".join(
-                [self.resource_url(), "contacts"])
+        url = f"{self.resource_url()}/contacts"
 
-            self.logger.debug("url=%s", url)
+        self.logger.debug("url=%s", url)
+
+        contacts = self.connection.get_json(url)['data']
+
+        return contacts
+
+
+# Opsgenie's responder, recipient and participant types
+# and the Popsgenie class representing each
+_RESOURCE_CLASSES = {
+    'schedule': Schedule,
+    'team': Team,
+    'user': User,
+}
+
+
+def _shared(resource_class: type, connection: 'tool.Connection', data: dict) -> Base:
+    """Return the Team or User the connection already holds for data's id,
+    with data's fields added, creating and remembering it otherwise, so a
+    user appearing in many rotations or on call lists is one object queried
+    at most once
+
+    Args:
+        resource_class (type): Team or User
+        connection (tool.Connection): connection the resource is shared on
+        data (dict): fields returned by Opsgenie
+
+    Returns:
+        Base: the shared resource
+    """
+    resources = connection.users if resource_class is User else connection.teams
+
+    resource = resources.get(data.get('id'))
+    if resource is None:
+        resource = resource_class(connection, **data)
+        if 'id' in data:
+            resources[data['id']] = resource
+    else:
+        # Each reference may carry fields the others didn't, e.g. on calls
+        # have a user's name and rotations their username; keep them all
+        resource._context = {**data, **resource._context} # pylint: disable=protected-access
+
+    return resource
+
+
+def prefetch_teams(schedules: List[Schedule], max_workers: int = 16):
+    """Query the teams owning many schedules concurrently, once per team,
+    so reading each schedule's team doesn't cost a request per schedule
+
+    Args:
+        schedules (List[Schedule]): schedules whose team is read later
+        max_workers (int, optional): number of concurrent requests. Defaults to 16.
+    """
+    teams: Dict[str, Team] = {}
+
+    for schedule in schedules:
+        # ownerTeam comes with listed schedules; don't query for it
+        owner_team = schedule._context.get('ownerTeam') # pylint: disable=protected-access
+        if not owner_team or 'team' in schedule.__dict__:
+            continue
+
+        team = teams.get(owner_team['id']) or schedule.connection.teams.get(owner_team['id'])
+        if team is None:
+            team = Team(schedule.connection, id=owner_team['id'])
+
+        # teams seen only as references still need querying
+        if not team._queried: # pylint: disable=protected-access
+            teams[owner_team['id']] = team
 
-            response = self.connection.session.get(url)
+        # fill in the team property's cache
+        schedule.__dict__['team'] = team
 
-            self.__contacts = response.json()['data']
+    tool.hydrate(list(teams.values()), max_workers=max_workers)
 
-        return self.__contacts
+    for team in teams.values():
+        team.connection.teams[team.id] = team
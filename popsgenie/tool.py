@@ -1,46 +1,371 @@
 """Generate an iterator for "paging" through list calls"""
+import copy
 import logging
-from collections import namedtuple
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Iterator, List, Optional, Tuple
+from urllib import parse
 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def make_session(
+        api_key: str,
+        pool_connections: int = 32,
+        pool_maxsize: int = 64,
+        http_cache: bool = False) -> requests.Session:
+    """Build a session authorized for Opsgenie whose connections are
+    kept alive and shared by every request made through it
+
+    Args:
+        api_key (str): Opsgenie API key sent in the Authorization header
+        pool_connections (int, optional): number of hosts to keep pools for. Defaults to 32.
+        pool_maxsize (int, optional): connections kept alive per host. Defaults to 64.
+        http_cache (bool, optional): revalidate repeated GETs through an in-memory
+            HTTP cache. Requires the cachecontrol package. Defaults to False.
+
+    Returns:
+        requests.Session: session to pass to Connection
+    """
+    session = requests.Session()
+    session.headers.update(
+        {"Authorization": api_key}
+    )
+
+    adapter_class = HTTPAdapter
+    if http_cache:
+        # cachecontrol is optional; only import it when asked to cache
+        from cachecontrol import CacheControlAdapter # pylint: disable=import-outside-toplevel,import-error
+        adapter_class = CacheControlAdapter
+
+    # Keep more connections alive for paging and property lookups
+    # and back off when Opsgenie rate limits (429) or errors.
+    adapter = adapter_class(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504]))
+    session.mount('https://', adapter)
+
+    if orjson is not None:
+        session.hooks['response'].append(orjson_hook)
+
+    return session
+
+
+class Connection(namedtuple('Connection', 'session, url_base')):
+    """Pre-authorized session and the Opsgenie url it queries.
+
+    Resources fetch their data through get_json which can keep decoded
+    responses for cache_ttl seconds, in a least recently used cache, so
+    repeated lookups of the same resource skip the round trip.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __new__(
+            cls,
+            session,
+            url_base: str,
+            cache_ttl: float = 0,
+            cache_size: int = 1024):
+        """
+        Args:
+            session (requests.sessions.Session): an pre-authorized session object,
+                make_session builds one with pooled keep-alive connections
+            url_base (str): The base url for Opsgenie
+            cache_ttl (float, optional): seconds a response is reused for.
+                Defaults to 0, no caching.
+            cache_size (int, optional): most responses kept in the cache. Defaults to 1024.
+        """
+        # Still unpacks and indexes as (session, url_base);
+        # the cache and shared resources live alongside
+        self = super().__new__(cls, session, url_base)
+
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+
+        self._cache: 'OrderedDict[tuple, Tuple[float, dict]]' = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # Teams and users referenced from many resources, by id,
+        # shared while anything still uses them
+        self.teams: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+        self.users: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+        return self
+
+    # namedtuple builds these through tuple.__new__, which would skip the cache
+    @classmethod
+    def _make(cls, iterable) -> 'Connection': # pylint: disable=arguments-differ
+        return cls(*iterable)
+
+    def _replace(self, **kwargs) -> 'Connection': # pylint: disable=arguments-differ
+        return type(self)(
+            **{**self._asdict(), **kwargs},
+            cache_ttl=self.cache_ttl,
+            cache_size=self.cache_size)
+
+    def get_json(self, url: str, **kwargs) -> dict:
+        """GET url and return the decoded response body
+
+        Args:
+            url (str): Opsgenie API url
+            kwargs: passed on to session.get
+
+        Returns:
+            dict: decoded response body
+        """
+        if self.cache_ttl <= 0:
+            return self.session.get(url, **kwargs).json()
+
+        key = (url, tuple(sorted((kwargs.get('params') or {}).items())))
+
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self.cache_ttl:
+                self._cache.move_to_end(key)
+                self.logger.debug("cache hit url=%s", url)
+
+                # hits are handed their own copy to change
+                return copy.deepcopy(cached[1])
+
+        json = self.session.get(url, **kwargs).json()
+
+        with self._cache_lock:
+            # keep a private copy; resources change what they're handed
+            self._cache[key] = (time.monotonic(), copy.deepcopy(json))
+            self._cache.move_to_end(key)
+
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return json
+
+
+# Number of pages requested at once when Pages runs in parallel
+PARALLEL_PAGES = 8
 
-Connection = namedtuple('Connection', 'session, url_base')
 
 class Pages():
-    """Class for paging over Opsgenie data"""
+    """Class for paging over Opsgenie data
+
+    Pages is a one-shot iterator; once the last page has been returned
+    it stays exhausted rather than querying Opsgenie again.
+    """
     logger = logging.getLogger(__name__)
 
-    def __init__(self, connection: Connection, url: str, PopsgenieClass):
+    def __init__( # pylint: disable=too-many-arguments
+            self,
+            connection: Connection,
+            url: str,
+            PopsgenieClass,
+            params: Optional[dict] = None,
+            *,
+            prefetch: bool = False,
+            parallel: bool = False):
         self.connection = connection
-        self.url_start = url
-        self.url_next = url
+        self.url = url
+        # Query parameters only apply to the first request;
+        # Opsgenie's paging.next urls carry their own.
+        self.params = params
         self.api_class = PopsgenieClass
+        self.prefetch = prefetch
+        self.parallel = parallel
+
+        self._pages: Optional[Iterator[list]] = None
 
     def __iter__(self):
         return self
 
     def __next__(self):
-        if self.url_next is None:
-            self.url_next = self.url_start
-            raise StopIteration
+        if self._pages is None:
+            self._pages = self._generate_pages()
 
-        self.logger.debug("url_next=%s", self.url_next)
+        return next(self._pages)
 
-        response = self.connection.session.get(self.url_next)
-        json = response.json()
+    def reset(self):
+        """Page from the start again; the next iteration re-queries Opsgenie"""
+        self.close()
 
-        self.url_next = json.get('paging', {}).get('next', None)
+        self._pages = None
 
-        api_objects = []
-        if isinstance(json['data'], dict):
-            api_objects = [
-                self.api_class(
-                    connection=self.connection,
-                    **json['data'])]
+    def resources(self) -> Iterator:
+        """Iterate over resources one at a time rather than a page at a time.
+        Pages past the one holding the last resource read aren't requested,
+        so callers looking for a single match can stop early.
+
+        Yields:
+            api_class objects, in the order Opsgenie returns them
+        """
+        try:
+            for page in self:
+                yield from page
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop paging early, cancelling the request for any page
+        fetched ahead of the caller. Pages is exhausted afterwards.
+        """
+        if self._pages is None:
+            self._pages = iter(())
         else:
-            api_objects = [
-                self.api_class(
-                    connection=self.connection,
-                    **api_data)
-                for api_data in json['data']]
+            self._pages.close()
+
+    def _generate_pages(self) -> Iterator[list]:
+        """Request each page, following paging.next, and convert
+        its data to api_class objects
+
+        Yields:
+            list: api_class objects found on a page
+        """
+        # Each listing has its own workers so it never
+        # queues behind pages another listing requested
+        executor = ThreadPoolExecutor(max_workers=PARALLEL_PAGES if self.parallel else 1)
+        futures: Deque[Future] = deque()
+        # urls of pages known about but not yet requested
+        pending: Deque[str] = deque()
+        # Only read ahead once the caller has come back for a second page,
+        # so taking just the first page costs a single request
+        read_ahead = self.parallel
+
+        try:
+            self.logger.debug("url=%s params=%s", self.url, self.params)
+
+            futures.append(executor.submit(
+                self.connection.get_json, self.url, params=self.params))
+
+            while futures:
+                json = futures.popleft().result()
+
+                paging = json.get('paging', {})
+                url_next = paging.get('next', None)
+
+                # A single resource is the whole answer; don't page after it
+                if isinstance(json['data'], dict):
+                    url_next = None
+
+                # Pages already known, from a parallel fan out,
+                # are returned before following paging.next again
+                if url_next is not None and not futures and not pending:
+                    if self.parallel and paging.get('last'):
+                        pending.extend(page_urls(url_next, paging['last']))
+                    else:
+                        pending.append(url_next)
+
+                # Request the following page(s) while the caller
+                # works through the current one
+                if read_ahead:
+                    self._top_up(executor, futures, pending)
+
+                data = json['data']
+
+                api_objects = [
+                    self.api_class(
+                        connection=self.connection,
+                        **api_data)
+                    for api_data in ([data] if isinstance(data, dict) else data)]
+
+                if self.prefetch:
+                    hydrate(api_objects)
+
+                yield api_objects
+
+                read_ahead = True
+                self._top_up(executor, futures, pending)
+        finally:
+            # Pages requested ahead aren't needed when the caller stops early
+            for future in futures:
+                future.cancel()
+
+            executor.shutdown(wait=False)
+
+    def _top_up(self, executor: ThreadPoolExecutor, futures: Deque[Future], pending: Deque[str]):
+        """Request pending urls until PARALLEL_PAGES are in flight,
+        so a long listing doesn't hold every page in memory at once
+
+        Args:
+            executor (ThreadPoolExecutor): this listing's workers
+            futures (Deque[Future]): page requests in flight, appended to
+            pending (Deque[str]): page urls not yet requested, taken from
+        """
+        while pending and len(futures) < PARALLEL_PAGES:
+            url = pending.popleft()
+
+            self.logger.debug("url_next=%s", url)
+
+            futures.append(executor.submit(self.connection.get_json, url))
+
+
+def page_urls(url_next: str, url_last: str) -> List[str]:
+    """Build the url of every page from url_next through url_last
+    by stepping the offset query parameter by limit
+
+    Args:
+        url_next (str): url of the next page, from paging.next
+        url_last (str): url of the last page, from paging.last
+
+    Returns:
+        List[str]: page urls in order. Only url_next is returned
+            when the urls don't carry offset and limit parameters.
+    """
+    parts = parse.urlsplit(url_next)
+    query = parse.parse_qs(parts.query)
+
+    try:
+        offset = int(query['offset'][0])
+        limit = int(query['limit'][0])
+        offset_last = int(parse.parse_qs(parse.urlsplit(url_last).query)['offset'][0])
+    except (KeyError, ValueError):
+        return [url_next]
+
+    if limit < 1 or offset_last < offset:
+        return [url_next]
+
+    urls = []
+    for page_offset in range(offset, offset_last + 1, limit):
+        query['offset'] = [str(page_offset)]
+        urls.append(parse.urlunsplit(parts._replace(query=parse.urlencode(query, doseq=True))))
+
+    return urls
+
+
+def hydrate(api_objects: list, max_workers: int = 16, **kwargs):
+    """Query Opsgenie, concurrently, for each object's attributes
+    so reading them later doesn't trigger a request per object
+
+    Args:
+        api_objects (list): Popsgenie resources to query
+        max_workers (int, optional): number of concurrent requests. Defaults to 16.
+        **kwargs: passed to each query, e.g. params
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # consume the results so errors raised in a worker surface here
+        list(executor.map(
+            lambda api_object: api_object.query_attributes(api_object.resource_url(), **kwargs),
+            api_objects))
+
+
+def orjson_hook(response, *_args, **_kwargs):
+    """requests response hook that decodes the body with orjson,
+    which is considerably faster than the json module requests uses
+
+    Args:
+        response (requests.Response): response to patch
+    """
+    def json(**_kwargs):
+        return orjson.loads(response.content) # pylint: disable=no-member
 
-        return api_objects
+    response.json = json
@@ -0,0 +1,67 @@
+"""Opsgenie response bodies shared between tests.
+Tests read these without changing them.
+"""
+from types import MappingProxyType
+
+# Leaf values repeated across payloads, shared read-only
+EMPTY_ADDRESS = MappingProxyType({
+    "city": "",
+    "country": "",
+    "line": "",
+    "state": "",
+    "zipCode": "",
+})
+ROLE_ADMIN = MappingProxyType({"id": "Admin", "name": "Admin"})
+ROLE_USER = MappingProxyType({"id": "User", "name": "User"})
+
+USERS = [
+    {
+        "blocked": False,
+        "createdAt": "2019-04-14T16:22:44.947Z",
+        "fullName": "Bob McThornton",
+        "id": "cza5093-fbc7-4533-96e5-510f67b5025f",
+        "locale": "en_US",
+        "role": ROLE_USER,
+        "timeZone": "America/Chicago",
+        "userAddress": EMPTY_ADDRESS,
+        "username": "bmcthornton@notreal.com",
+        "verified": True,
+    },
+    {
+        "blocked": False,
+        "createdAt": "2018-03-20T11:24:32.022Z",
+        "fullName": "Sarah Johnson",
+        "id": "87y9dg27-fbc7-4304-895c-1666d89851f0",
+        "locale": "en_US",
+        "role": ROLE_ADMIN,
+        "timeZone": "America/Chicago",
+        "userAddress": EMPTY_ADDRESS,
+        "username": "sjohnson@notreal.com",
+        "verified": True,
+    },
+]
+
+# First of two pages listing USERS
+USER_LIST_PAGE_1 = {
+    "data": USERS,
+    "paging": {
+        "first": "https://api.opsgenie.com/v2/users?limit=2&offset=0&order=ASC&sort=username",
+        "last": "https://api.opsgenie.com/v2/users?limit=2&offset=4&order=ASC&sort=username",
+        "next": "https://api.opsgenie.com/v2/users?limit=2&offset=2&order=ASC&sort=username",
+    },
+    "requestId": "87y9dg27-0b6a-435f-ac49-6b25c9bb791f",
+    "took": 0.023,
+    "totalCount": 2,
+}
+
+# Last page listing USERS; it has no paging.next
+USER_LIST_PAGE_2 = {
+    "data": USERS,
+    "paging": {
+        "first": "https://api.opsgenie.com/v2/users?limit=2&offset=0&order=ASC&sort=username",
+        "last": "https://api.opsgenie.com/v2/users?limit=2&offset=4&order=ASC&sort=username",
+    },
+    "requestId": "87y9dg27-0b6a-435f-ac49-6b25c9bb791f",
+    "took": 0.023,
+    "totalCount": 2,
+}
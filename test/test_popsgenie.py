@@ -0,0 +1,168 @@
+import unittest
+from unittest.mock import Mock
+
+import popsgenie.tool
+import popsgenie.resource
+import popsgenie
+
+from . import fixtures
+
+
+class Popsgenie(unittest.TestCase):
+    def test_batch_load_users_makes_one_query(self):
+        """Loading several users by id makes a single
+        user list query
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+        response = session.get.return_value
+        response.json.return_value = {"data": fixtures.USERS, "paging": {}}
+
+        genie = popsgenie.Popsgenie("api key")
+        genie.connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        # Act
+        users = genie.batch_load_users([
+            "cza5093-fbc7-4533-96e5-510f67b5025f",
+            "87y9dg27-fbc7-4304-895c-1666d89851f0"])
+
+        # Assert
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual(len(users), 2)
+        self.assertIsInstance(users[0], popsgenie.resource.User)
+        self.assertEqual(
+            session.get.call_args.kwargs["params"]["query"],
+            "id:(cza5093-fbc7-4533-96e5-510f67b5025f OR 87y9dg27-fbc7-4304-895c-1666d89851f0)")
+        self.assertEqual(session.get.call_args.kwargs["params"]["limit"], 2)
+        self.assertEqual(session.get.call_args.kwargs["params"]["expand"], "contact")
+
+    def test_batch_load_users_caps_limit(self):
+        """Loading more users than one page holds asks for
+        a full page and follows paging.next for the rest
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+        first_page = Mock(spec_set=['json'])
+        first_page.json.return_value = {
+            "data": fixtures.USERS,
+            "paging": {"next": "https://api.opsgenie.com/v2/users?offset=100&limit=100"}}
+        last_page = Mock(spec_set=['json'])
+        last_page.json.return_value = {"data": fixtures.USERS, "paging": {}}
+        session.get.side_effect = [first_page, last_page]
+
+        genie = popsgenie.Popsgenie("api key")
+        genie.connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        # Act
+        users = genie.batch_load_users([f"user-{index}" for index in range(150)])
+
+        # Assert
+        self.assertEqual(session.get.call_args_list[0].kwargs["params"]["limit"], 100)
+        self.assertEqual(session.get.call_count, 2)
+        self.assertEqual(len(users), 2 * len(fixtures.USERS))
+
+    def test_cached_listing_survives_reading_responders(self):
+        """Reading an alert's responders doesn't change the
+        cached page a later listing is built from
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+        response = session.get.return_value
+        response.json.return_value = {
+            "data": [{
+                "id": "2f3a9d4e-0c1b-4b8e-9a6f-5d7c8e9f0a1b",
+                "responders": [{"type": "team", "id": "rungzd54-hc3l-t7i9-sqf5-4swjxnzkbejv"}],
+            }],
+            "paging": {},
+        }
+
+        genie = popsgenie.Popsgenie("api key")
+        genie.connection = popsgenie.tool.Connection(
+            session, 'https://api.opsgenie.com/v2', cache_ttl=60)
+
+        first_responders = next(genie.alerts())[0].responders
+
+        # Act
+        alert = next(genie.alerts())[0]
+        responders = alert.responders
+
+        # Assert
+        self.assertEqual(session.get.call_count, 1)
+        self.assertIsInstance(first_responders[0], popsgenie.resource.Team)
+        self.assertIsInstance(responders[0], popsgenie.resource.Team)
+
+    def test_users_by_username(self):
+        """Listing users by username quotes the identifier
+        and sends the identifier type as a parameter
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+        response = session.get.return_value
+        response.json.return_value = {
+            "data": {"id": "cza5093-fbc7-4533-96e5-510f67b5025f", "username": "bob mc@notreal.com"},
+        }
+
+        genie = popsgenie.Popsgenie("api key")
+        genie.connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        # Act
+        users = next(genie.users(identifier="bob mc@notreal.com", identifier_type="username"))
+
+        # Assert
+        self.assertEqual(len(users), 1)
+        session.get.assert_called_once_with(
+            "https://api.opsgenie.com/v2/users/bob%20mc%40notreal.com",
+            params={"offset": 0, "limit": 20, "identifierType": "username"})
+
+    def test_get_teams_queries_each_id(self):
+        """Getting teams by id requests each team
+        and returns them in the order asked for
+        """
+        # Arrange
+        def get(url, **_kwargs):
+            response = Mock(spec_set=['json'])
+            team_id = url.rsplit("/", 1)[-1]
+            response.json.return_value = {"data": {"id": team_id, "name": f"{team_id} team"}}
+            return response
+
+        session = Mock(spec_set=['get'])
+        session.get.side_effect = get
+
+        genie = popsgenie.Popsgenie("api key")
+        genie.connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        # Act
+        teams = genie.get_teams(["team-0", "team-1", "team-2"])
+
+        # Assert
+        self.assertEqual(session.get.call_count, 3)
+        self.assertEqual(
+            [team.name for team in teams],
+            ["team-0 team", "team-1 team", "team-2 team"])
+
+    def test_get_users_shares_queried_users(self):
+        """Getting users the connection already holds, fully
+        queried, returns them without querying again
+        """
+        # Arrange
+        def get(url, **_kwargs):
+            response = Mock(spec_set=['json'])
+            user_id = url.rsplit("/", 1)[-1]
+            response.json.return_value = {"data": {"id": user_id, "username": f"{user_id}@notreal.com"}}
+            return response
+
+        session = Mock(spec_set=['get'])
+        session.get.side_effect = get
+
+        genie = popsgenie.Popsgenie("api key")
+        genie.connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        user = genie.get_users(["user-0"])[0]
+
+        # Act
+        users = genie.get_users(["user-0", "user-1"])
+
+        # Assert
+        self.assertIs(users[0], user)
+        self.assertEqual(users[1].username, "user-1@notreal.com")
+        self.assertEqual(session.get.call_count, 2)
@@ -1,32 +1,41 @@
-import random
-import string
+import datetime
+import threading
 import unittest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock
 
 import popsgenie.tool
 import popsgenie.resource
 import popsgenie
 
+from . import fixtures
+
+
 def random_id():
-    random_string = "".join(
-        random.choices(string.ascii_lowercase + string.digits, k=32)
-    )
+    return str(uuid.uuid4())
+
 
-    random_id = (
-        f"{random_string[0:8]}-{random_string[8:12]}-"
-        f"{random_string[12:16]}-{random_string[16:20]}-"
-        f"{random_string[20:None]}"
-    )
+class ResourceTestCase(unittest.TestCase):
+    """Share one mocked session, and the connection using it,
+    between a class's tests rather than building them per test
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.session = Mock(spec_set=['get'])
+        cls.connection = popsgenie.tool.Connection(cls.session, "xyz")
 
-    return random_id
+    def setUp(self):
+        self.session.reset_mock()
+        self.session.get.reset_mock(return_value=True, side_effect=True)
 
+        self.connection.teams.clear()
+        self.connection.users.clear()
 
-class Alert(unittest.TestCase):
+
+class Alert(ResourceTestCase):
     def test_initialization_with_list_data(self):
         # Arrange
-        session = Mock()
-        connection = popsgenie.tool.Connection(session, "xyz")
-
         alert_id = random_id()
 
         alert_data = {
@@ -61,22 +70,44 @@ class Alert(unittest.TestCase):
         }
 
         # Act
-        alert = popsgenie.resource.Alert(connection, **alert_data)
+        alert = popsgenie.resource.Alert(self.connection, **alert_data)
 
         # Assert
         self.assertIsInstance(alert, popsgenie.resource.Alert)
 
+    def test_responders_converted_by_type(self):
+        """Responders become the Popsgenie resource for their
+        type; unknown types are left as dicts
+        """
+        # Arrange
+        alert = popsgenie.resource.Alert(
+            self.connection,
+            id=random_id(),
+            responders=[
+                {"type": "team", "id": random_id()},
+                {"type": "user", "id": random_id()},
+                {"type": "schedule", "id": random_id()},
+                {"type": "escalation", "id": random_id()},
+            ],
+        )
+
+        # Act
+        responders = alert.responders
+
+        # Assert
+        self.assertIsInstance(responders[0], popsgenie.resource.Team)
+        self.assertIsInstance(responders[1], popsgenie.resource.User)
+        self.assertIsInstance(responders[2], popsgenie.resource.Schedule)
+        self.assertEqual(responders[3]["type"], "escalation")
+        self.session.get.assert_not_called()
 
-class PopsgenieSchedule(unittest.TestCase):
+
+class PopsgenieSchedule(ResourceTestCase):
     def test_initialization_with_list_data(self):
         """Data, from list schedules,
         can properly instantiate a Schedule object
         """
         # Arrange
-
-        session = Mock()
-        connection = popsgenie.tool.Connection(session, "xyz")
-
         schedule_data = {
             "id": "0d4w397f-10j7-k8ht-zx92-06796bc00cbd",
             "name": "Some On Call",
@@ -91,21 +122,269 @@ class PopsgenieSchedule(unittest.TestCase):
         }
 
         # Act
-        schedule = popsgenie.resource.Schedule(connection, **schedule_data)
+        schedule = popsgenie.resource.Schedule(self.connection, **schedule_data)
 
         # Assert
         self.assertIsInstance(schedule, popsgenie.resource.Schedule)
 
+    def test_rotations_from_initialization_data(self):
+        """Rotations passed in on initialization are used
+        without querying the schedule again
+        """
+        # Arrange
+        schedule = popsgenie.resource.Schedule(
+            self.connection,
+            id=random_id(),
+            name="Some On Call",
+            rotations=[
+                {
+                    "id": random_id(),
+                    "name": "Some on Call Rotation",
+                    "type": "daily",
+                    "participants": [],
+                }
+            ],
+        )
+
+        # Act
+        rotations = schedule.rotations
+
+        # Assert
+        self.assertEqual(len(rotations), 1)
+        self.assertIsInstance(rotations[0], popsgenie.resource.Rotation)
+        self.session.get.assert_not_called()
+
+    def test_on_calls_read_concurrently(self):
+        """Threads reading on_calls on different schedules
+        query Opsgenie at the same time
+        """
+        # Arrange
+        barrier = threading.Barrier(2, timeout=5)
+
+        def get(_url, **_kwargs):
+            # both threads have to be mid request for either to return
+            barrier.wait()
+            response = Mock(spec_set=['json'])
+            response.json.return_value = {"data": {"onCallParticipants": []}}
+            return response
+
+        self.session.get.side_effect = get
+
+        schedules = [
+            popsgenie.resource.Schedule(self.connection, id=random_id()) for _ in range(2)]
+
+        # Act
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            on_calls = list(executor.map(lambda schedule: schedule.on_calls, schedules))
+
+        # Assert
+        self.assertEqual(on_calls, [[], []])
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_hydrate_on_calls_queries_each_user(self):
+        """hydrate_on_calls fills in each on call user's
+        attributes so reading them doesn't query again
+        """
+        # Arrange
+        user_ids = [random_id(), random_id()]
+
+        def get(url, **_kwargs):
+            response = Mock(spec_set=['json'])
+            if url.endswith("/on-calls"):
+                response.json.return_value = {"data": {"onCallParticipants": [
+                    {"id": user_id, "type": "user"} for user_id in user_ids]}}
+            else:
+                user_id = url.rsplit("/", 1)[-1]
+                response.json.return_value = {"data": {"id": user_id, "username": user_id}}
+            return response
+
+        self.session.get.side_effect = get
+
+        schedule = popsgenie.resource.Schedule(self.connection, id=random_id())
+
+        # Act
+        on_calls = schedule.hydrate_on_calls()
+        call_count = self.session.get.call_count
+        usernames = [user.username for user in on_calls]
+
+        # Assert
+        self.assertEqual(usernames, user_ids)
+        self.assertEqual(call_count, 3)
+
+    def test_on_calls_keep_fields_of_shared_participants(self):
+        """A user seen first as a rotation participant, then on call,
+        is one User holding the fields from both
+        """
+        # Arrange
+        user_id = random_id()
+        self.session.get.return_value.json.return_value = {"data": {"onCallParticipants": [
+            {"id": user_id, "name": "bfultherfrump@notrealthings.com", "type": "user"}]}}
+
+        schedule = popsgenie.resource.Schedule(
+            self.connection,
+            id=random_id(),
+            rotations=[
+                {"id": random_id(), "participants": [
+                    {"type": "user", "id": user_id, "username": "bfultherfrump@notrealthings.com"}]},
+            ],
+        )
+        participant = schedule.rotations[0].participants[0]
+
+        # Act
+        on_call = schedule.on_calls[0]
+
+        # Assert
+        self.assertIs(on_call, participant)
+        self.assertEqual(on_call.name, "bfultherfrump@notrealthings.com")
+        self.assertEqual(on_call.username, "bfultherfrump@notrealthings.com")
+        self.assertEqual(self.session.get.call_count, 1)
+
+    def test_prefetch_participants_queries_each_user_once(self):
+        """Users in several rotations are queried once,
+        concurrently, before they're read, roles included
+        """
+        # Arrange
+        def get(url, **_kwargs):
+            response = Mock(spec_set=['json'])
+            user_id = url.rsplit("/", 1)[-1]
+            response.json.return_value = {
+                "data": {"id": user_id, "username": user_id, "role": fixtures.ROLE_USER}}
+            return response
+
+        self.session.get.side_effect = get
+
+        user_ids = [random_id(), random_id()]
+        schedule = popsgenie.resource.Schedule(
+            self.connection,
+            id=random_id(),
+            rotations=[
+                {"id": random_id(), "participants": [
+                    {"type": "user", "id": user_ids[0]},
+                    {"type": "user", "id": user_ids[1]}]},
+                {"id": random_id(), "participants": [
+                    {"type": "user", "id": user_ids[0]},
+                    {"type": "escalation", "id": random_id()}]},
+            ],
+        )
+
+        # Act
+        users = schedule.prefetch_participants()
+        prefetch_calls = self.session.get.call_count
+        self.session.get.reset_mock()
+        usernames = sorted(user.username for user in users)
+        roles = [user.role for user in users]
+
+        # Assert
+        self.assertEqual(usernames, sorted(user_ids))
+        self.assertEqual(roles, [fixtures.ROLE_USER] * 2)
+        self.assertEqual(prefetch_calls, 2)
+        self.session.get.assert_not_called()
+
+    def test_prefetch_teams_queries_each_team_once(self):
+        """Schedules sharing an owning team have it
+        queried once, before their team is read
+        """
+        # Arrange
+        team_id = random_id()
+        self.session.get.return_value.json.return_value = {
+            "data": {"id": team_id, "name": "Team 0"}}
+
+        schedules = [
+            popsgenie.resource.Schedule(
+                self.connection, id=random_id(), ownerTeam={"id": team_id, "name": "Team 0"})
+            for _ in range(3)
+        ]
+
+        # Act
+        popsgenie.resource.prefetch_teams(schedules)
+        teams = [schedule.team for schedule in schedules]
+
+        # Assert
+        self.assertEqual(self.session.get.call_count, 1)
+        self.assertEqual(teams[0].name, "Team 0")
+        self.assertIs(teams[0], teams[2])
+
+    def test_team_shared_by_schedules(self):
+        """Schedules owned by the same team share
+        one Team and one query
+        """
+        # Arrange
+        team_id = random_id()
+        self.session.get.return_value.json.return_value = {
+            "data": {"id": team_id, "name": "Team 0"}}
+
+        schedule_1 = popsgenie.resource.Schedule(
+            self.connection, id=random_id(), ownerTeam={"id": team_id, "name": "Team 0"})
+        schedule_2 = popsgenie.resource.Schedule(
+            self.connection, id=random_id(), ownerTeam={"id": team_id, "name": "Team 0"})
+
+        # Act
+        team_1 = schedule_1.team
+        team_2 = schedule_2.team
+
+        # Assert
+        self.assertIs(team_1, team_2)
+        self.assertEqual(self.session.get.call_count, 1)
+
+    def test_prefetch_teams_queries_team_references(self):
+        """prefetch_teams queries a team the connection only
+        holds as a reference, e.g. from a responder
+        """
+        # Arrange
+        team_id = random_id()
+        self.session.get.return_value.json.return_value = {
+            "data": {"id": team_id, "name": "Team 0", "description": "Some Team"}}
+
+        reference = popsgenie.resource.Team(self.connection, id=team_id, name="Team 0")
+        self.connection.teams[team_id] = reference
+
+        schedules = [
+            popsgenie.resource.Schedule(
+                self.connection, id=random_id(), ownerTeam={"id": team_id, "name": "Team 0"})
+            for _ in range(2)
+        ]
+
+        # Act
+        popsgenie.resource.prefetch_teams(schedules)
+        prefetch_calls = self.session.get.call_count
+        teams = [schedule.team for schedule in schedules]
+
+        # Assert
+        self.assertEqual(prefetch_calls, 1)
+        self.assertIs(teams[0], reference)
+        self.assertIs(teams[1], reference)
+        self.assertEqual(reference.description, "Some Team")
+        self.assertEqual(self.session.get.call_count, 1)
+
+    def test_team_reference_is_queried_when_read(self):
+        """Reading a schedule's team that the connection only
+        holds as a reference queries it in place
+        """
+        # Arrange
+        team_id = random_id()
+        self.session.get.return_value.json.return_value = {
+            "data": {"id": team_id, "name": "Team 0", "description": "Some Team"}}
+
+        reference = popsgenie.resource.Team(self.connection, id=team_id, name="Team 0")
+        self.connection.teams[team_id] = reference
 
-class PopsgenieRotation(unittest.TestCase):
+        schedule = popsgenie.resource.Schedule(
+            self.connection, id=random_id(), ownerTeam={"id": team_id, "name": "Team 0"})
+
+        # Act
+        team = schedule.team
+
+        # Assert
+        self.assertIs(team, reference)
+        self.assertEqual(self.session.get.call_count, 1)
+
+
+class PopsgenieRotation(ResourceTestCase):
     def test_initialization_with_schedules_rotation_data(self):
         """Data, from schedule's rotation query,
         can properly instantiate a Rotation object
         """
         # Arrange
-        session = Mock()
-        connection = popsgenie.tool.Connection(session, "xyz")
-
         data = {
             "id": "0d4w397f-10j7-k8ht-zx92-06796bc00cbd",
             "name": "Some on Call Rotation",
@@ -122,21 +401,50 @@ class PopsgenieRotation(unittest.TestCase):
         }
 
         # Act
-        rotation = popsgenie.resource.Rotation(connection, **data)
+        rotation = popsgenie.resource.Rotation(self.connection, **data)
 
         # Assert
         self.assertIsInstance(rotation, popsgenie.resource.Rotation)
 
+    def test_participants_shared_between_rotations(self):
+        """A user taking part in several rotations
+        is the same User object in each
+        """
+        # Arrange
+        user_id = random_id()
+        rotations = [
+            popsgenie.resource.Rotation(
+                self.connection,
+                id=random_id(),
+                participants=[{"type": "user", "id": user_id}])
+            for _ in range(2)
+        ]
+
+        # Act
+        participants = [rotation.participants[0] for rotation in rotations]
 
-class PopsgenieTeam(unittest.TestCase):
+        # Assert
+        self.assertIs(participants[0], participants[1])
+        self.session.get.assert_not_called()
+
+    def test_resource_url_without_resource_name(self):
+        """Rotations aren't queried on their own, so asking
+        for their url raises rather than building a bad one
+        """
+        # Arrange
+        rotation = popsgenie.resource.Rotation(self.connection, id=random_id())
+
+        # Act, Assert
+        with self.assertRaises(TypeError):
+            rotation.resource_url()
+
+
+class PopsgenieTeam(ResourceTestCase):
     def test_initialization_with_list_data(self):
         """Data, from list team query,
         can properly instantiate a Team object
         """
         # Arrange
-        session = Mock()
-        connection = popsgenie.tool.Connection(session, "xyz")
-
         data = {
             "id": "0d4w397f-10j7-k8ht-zx92-06796bc00cbd",
             "name": "Some Team Name",
@@ -148,42 +456,236 @@ class PopsgenieTeam(unittest.TestCase):
         }
 
         # Act
-        team = popsgenie.resource.Team(connection, **data)
+        team = popsgenie.resource.Team(self.connection, **data)
 
         # Assert
         self.assertIsInstance(team, popsgenie.resource.Team)
 
+    def test_members_are_populated_with_one_user_query(self):
+        """Team members are built from a single user list query
+        so reading their attributes doesn't query each user
+        """
+        # Arrange
+        team_id = random_id()
+        user_id = random_id()
+
+        team_response = Mock(spec_set=['json'])
+        team_response.json.return_value = {
+            "data": {
+                "id": team_id,
+                "name": "Some Team Name",
+                "description": "",
+                "members": [
+                    {
+                        "role": "admin",
+                        "user": {"id": user_id, "username": "bfultherfrump@notrealthings.com"},
+                    }
+                ],
+            }
+        }
+        users_response = Mock(spec_set=['json'])
+        users_response.json.return_value = {
+            "data": [
+                {
+                    "id": user_id,
+                    "username": "bfultherfrump@notrealthings.com",
+                    "fullName": "Bubby Fultherfrump",
+                    "timeZone": "America/Chicago",
+                }
+            ]
+        }
+        self.session.get.side_effect = [team_response, users_response]
+
+        team = popsgenie.resource.Team(self.connection, id=team_id)
+
+        # Act
+        members = team.members
+
+        # Assert
+        self.assertEqual(len(members), 1)
+        self.assertEqual(members[0].fullName, "Bubby Fultherfrump")
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_members_are_shared_with_on_calls(self):
+        """A team member on call is the same User as
+        the one in the team's members
+        """
+        # Arrange
+        team_id = random_id()
+        user_id = random_id()
+
+        team_response = Mock(spec_set=['json'])
+        team_response.json.return_value = {
+            "data": {
+                "id": team_id,
+                "name": "Some Team Name",
+                "members": [{"role": "admin", "user": {"id": user_id, "username": "listed"}}],
+            }
+        }
+        users_response = Mock(spec_set=['json'])
+        users_response.json.return_value = {
+            "data": [{"id": user_id, "username": "listed", "fullName": "Listed User"}]
+        }
+        on_calls_response = Mock(spec_set=['json'])
+        on_calls_response.json.return_value = {
+            "data": {"onCallParticipants": [{"id": user_id, "name": "listed", "type": "user"}]}
+        }
+        self.session.get.side_effect = [team_response, users_response, on_calls_response]
+
+        team = popsgenie.resource.Team(self.connection, id=team_id)
+        schedule = popsgenie.resource.Schedule(self.connection, id=random_id())
+
+        # Act
+        members = team.members
+        on_calls = schedule.on_calls
+
+        # Assert
+        self.assertIs(on_calls[0], members[0])
+        self.assertEqual(on_calls[0].fullName, "Listed User")
+        self.assertEqual(self.session.get.call_count, 3)
+
+    def test_hydrate_members_queries_only_unlisted_members(self):
+        """hydrate_members leaves members the user list query
+        returned alone and queries the rest
+        """
+        # Arrange
+        team_id = random_id()
+        listed_id = random_id()
+        unlisted_id = random_id()
 
-class PopsgenieUser(unittest.TestCase):
+        team_response = Mock(spec_set=['json'])
+        team_response.json.return_value = {
+            "data": {
+                "id": team_id,
+                "name": "Some Team Name",
+                "members": [
+                    {"role": "admin", "user": {"id": listed_id, "username": "listed"}},
+                    {"role": "user", "user": {"id": unlisted_id, "username": "unlisted"}},
+                ],
+            }
+        }
+        users_response = Mock(spec_set=['json'])
+        users_response.json.return_value = {
+            "data": [{"id": listed_id, "username": "listed", "fullName": "Listed User"}]
+        }
+        user_response = Mock(spec_set=['json'])
+        user_response.json.return_value = {
+            "data": {"id": unlisted_id, "username": "unlisted", "fullName": "Unlisted User"}
+        }
+        self.session.get.side_effect = [team_response, users_response, user_response]
+
+        team = popsgenie.resource.Team(self.connection, id=team_id)
+
+        # Act
+        members = team.hydrate_members()
+
+        # Assert
+        self.assertEqual(
+            [member.fullName for member in members], ["Listed User", "Unlisted User"])
+        self.assertEqual(self.session.get.call_count, 3)
+        self.assertTrue(
+            self.session.get.call_args.args[0].endswith(f"/users/{unlisted_id}"))
+
+
+class PopsgenieUser(ResourceTestCase):
     def test_initialization_with_list_data(self):
         """Data, from list user query,
         can properly instantiate a User object
         """
         # Arrange
-        session = Mock()
-        connection = popsgenie.tool.Connection(session, "xyz")
-
         data = {
             "blocked": False,
             "verified": True,
             "id": "0d4w397f-10j7-k8ht-zx92-06796bc00cbd",
             "username": "bfultherfrump@notrealthings.com",
             "fullName": "Bubby Fultherfrump",
-            "role": {"id": "Admin", "name": "Admin"},
+            "role": fixtures.ROLE_ADMIN,
             "timeZone": "America/Chicago",
             "locale": "en_US",
-            "userAddress": {
-                "country": "",
-                "state": "",
-                "city": "",
-                "line": "",
-                "zipCode": "",
-            },
+            "userAddress": fixtures.EMPTY_ADDRESS,
             "createdAt": "2020-01-07T19:34:00.281Z",
         }
 
         # Act
-        user = popsgenie.resource.User(connection, **data)
+        user = popsgenie.resource.User(self.connection, **data)
 
         # Assert
         self.assertIsInstance(user, popsgenie.resource.User)
+
+    def test_initialization_without_id(self):
+        """A User can be created from a username alone,
+        without querying Opsgenie
+        """
+        # Act
+        user = popsgenie.resource.User(self.connection, username="bfultherfrump@notrealthings.com")
+
+        # Assert
+        self.assertEqual(user.username, "bfultherfrump@notrealthings.com")
+        self.session.get.assert_not_called()
+
+    def test_date_created_parses_created_at(self):
+        """date_created converts createdAt, in UTC, to a datetime"""
+        # Arrange
+        user = popsgenie.resource.User(
+            self.connection, id=random_id(), createdAt="2020-01-07T19:34:00.281Z")
+
+        # Act
+        date_created = user.date_created
+
+        # Assert
+        self.assertEqual(
+            date_created,
+            datetime.datetime(2020, 1, 7, 19, 34, 0, 281000, tzinfo=datetime.timezone.utc))
+        self.assertIs(user.date_created, date_created)
+
+    def test_missing_attribute_not_in_lookup_attributes(self):
+        """Reading an attribute that isn't a lookup attribute
+        raises AttributeError without querying Opsgenie
+        """
+        # Arrange
+        user = popsgenie.resource.User(self.connection, id=random_id())
+
+        # Act
+        has_attribute = hasattr(user, "notAnOpsgenieField")
+
+        # Assert
+        self.assertFalse(has_attribute)
+        self.session.get.assert_not_called()
+
+    def test_lookup_attributes_query_once(self):
+        """Reading several lookup attributes, including one Opsgenie
+        didn't return, queries the user a single time
+        """
+        # Arrange
+        user_id = random_id()
+        self.session.get.return_value.json.return_value = {
+            "data": {"id": user_id, "username": "bfultherfrump@notrealthings.com"}}
+
+        user = popsgenie.resource.User(self.connection, id=user_id)
+
+        # Act
+        username = user.username
+        has_details = hasattr(user, "details")
+
+        # Assert
+        self.assertEqual(username, "bfultherfrump@notrealthings.com")
+        self.assertFalse(has_details)
+        self.assertEqual(self.session.get.call_count, 1)
+
+    def test_fields_copied_when_first_read(self):
+        """Fields stay in the user's context until they're
+        read, without querying Opsgenie
+        """
+        # Arrange
+        user = popsgenie.resource.User(
+            self.connection, id=random_id(), username="bfultherfrump@notrealthings.com")
+
+        # Act
+        copied_before_read = "username" in vars(user)
+        username = user.username
+
+        # Assert
+        self.assertFalse(copied_before_read)
+        self.assertEqual(username, "bfultherfrump@notrealthings.com")
+        self.assertIn("username", vars(user))
+        self.session.get.assert_not_called()
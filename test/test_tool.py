@@ -1,134 +1,38 @@
-import random
-import string
+import itertools
 import unittest
-from unittest.mock import Mock
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
 
 import popsgenie.tool
 import popsgenie.resource
 
+from . import fixtures
 
-class Page(unittest.TestCase):
-    def random_id(self):
-        random_string = "".join(
-            random.choices(string.ascii_lowercase + string.digits, k=32)
-        )
 
-        random_id = (
-            f"{random_string[0:8]}-{random_string[8:12]}-"
-            f"{random_string[12:16]}-{random_string[16:20]}-"
-            f"{random_string[20:None]}"
-        )
+class Page(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # json() only returns the fixtures, so responses can be shared between tests
+        cls.user_list_response_1 = Mock(spec_set=['status_code', 'json'])
+        cls.user_list_response_1.status_code = 200
+        cls.user_list_response_1.json.return_value = fixtures.USER_LIST_PAGE_1
+        cls.user_list_response_2 = Mock(spec_set=['status_code', 'json'])
+        cls.user_list_response_2.status_code = 200
+        cls.user_list_response_2.json.return_value = fixtures.USER_LIST_PAGE_2
 
-        return random_id
+    def random_id(self):
+        return str(uuid.uuid4())
 
     def test_initialization(self):
         """iterating over page makes requests
         in the proper order
         """
         # Arrange
-        session = Mock()
-        response_1 = Mock()
-        response_1.status_code = 200
-        response_1.json.return_value = {
-            "data": [
-                {
-                    "blocked": False,
-                    "createdAt": "2019-04-14T16:22:44.947Z",
-                    "fullName": "Bob McThornton",
-                    "id": "cza5093-fbc7-4533-96e5-510f67b5025f",
-                    "locale": "en_US",
-                    "role": {"id": "User", "name": "User"},
-                    "timeZone": "America/Chicago",
-                    "userAddress": {
-                        "city": "",
-                        "country": "",
-                        "line": "",
-                        "state": "",
-                        "zipCode": "",
-                    },
-                    "username": "bmcthornton@notreal.com",
-                    "verified": True,
-                },
-                {
-                    "blocked": False,
-                    "createdAt": "2018-03-20T11:24:32.022Z",
-                    "fullName": "Sarah Johnson",
-                    "id": "87y9dg27-fbc7-4304-895c-1666d89851f0",
-                    "locale": "en_US",
-                    "role": {"id": "Admin", "name": "Admin"},
-                    "timeZone": "America/Chicago",
-                    "userAddress": {
-                        "city": "",
-                        "country": "",
-                        "line": "",
-                        "state": "",
-                        "zipCode": "",
-                    },
-                    "username": "sjohnson@notreal.com",
-                    "verified": True,
-                },
-            ],
-            "paging": {
-                "first": "https://api.opsgenie.com/v2/users?limit=2&offset=0&order=ASC&sort=username",
-                "last": "https://api.opsgenie.com/v2/users?limit=2&offset=4&order=ASC&sort=username",
-                "next": "https://api.opsgenie.com/v2/users?limit=2&offset=2&order=ASC&sort=username",
-            },
-            "requestId": "87y9dg27-0b6a-435f-ac49-6b25c9bb791f",
-            "took": 0.023,
-            "totalCount": 2,
-        }
-        response_2 = Mock()
-        response_2.status_code = 200
-        response_2.json.return_value = {
-            "data": [
-                {
-                    "blocked": False,
-                    "createdAt": "2019-04-14T16:22:44.947Z",
-                    "fullName": "Bob McThornton",
-                    "id": "cza5093-fbc7-4533-96e5-510f67b5025f",
-                    "locale": "en_US",
-                    "role": {"id": "User", "name": "User"},
-                    "timeZone": "America/Chicago",
-                    "userAddress": {
-                        "city": "",
-                        "country": "",
-                        "line": "",
-                        "state": "",
-                        "zipCode": "",
-                    },
-                    "username": "bmcthornton@notreal.com",
-                    "verified": True,
-                },
-                {
-                    "blocked": False,
-                    "createdAt": "2018-03-20T11:24:32.022Z",
-                    "fullName": "Sarah Johnson",
-                    "id": "87y9dg27-fbc7-4304-895c-1666d89851f0",
-                    "locale": "en_US",
-                    "role": {"id": "Admin", "name": "Admin"},
-                    "timeZone": "America/Chicago",
-                    "userAddress": {
-                        "city": "",
-                        "country": "",
-                        "line": "",
-                        "state": "",
-                        "zipCode": "",
-                    },
-                    "username": "sjohnson@notreal.com",
-                    "verified": True,
-                },
-            ],
-            "paging": {
-                "first": "https://api.opsgenie.com/v2/users?limit=2&offset=0&order=ASC&sort=username",
-                "last": "https://api.opsgenie.com/v2/users?limit=2&offset=4&order=ASC&sort=username",
-            },
-            "requestId": "87y9dg27-0b6a-435f-ac49-6b25c9bb791f",
-            "took": 0.023,
-            "totalCount": 2,
-        }
+        session = Mock(spec_set=['get'])
         session.get.side_effect = [
-            response_1,
-            response_2,
+            self.user_list_response_1,
+            self.user_list_response_2,
         ]
 
         connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
@@ -139,7 +43,7 @@ class Page(unittest.TestCase):
             popsgenie.resource.User,
         )
 
-        users = [user for users in pages for user in users]
+        users = list(itertools.chain.from_iterable(pages))
 
         # Assert
         self.assertEqual(session.get.call_count, 2)
@@ -151,7 +55,7 @@ class Page(unittest.TestCase):
         """
         # Arrange
         schedule_id = self.random_id()
-        session = Mock()
+        session = Mock(spec_set=['get'])
         response = session.get.return_value
         response.json.return_value = {
             "data": {
@@ -207,7 +111,7 @@ class Page(unittest.TestCase):
         """
         # Arrange
         team_id = self.random_id()
-        session = Mock()
+        session = Mock(spec_set=['get'])
 
         response = session.get.return_value
         response.json.return_value = {
@@ -265,7 +169,7 @@ class Page(unittest.TestCase):
         """
         # Arrange
         user_id = self.random_id()
-        session = Mock()
+        session = Mock(spec_set=['get'])
         connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
         response = session.get.return_value
         response.json.return_value = {
@@ -275,15 +179,9 @@ class Page(unittest.TestCase):
                 "fullName": "Buddy McPantshat",
                 "id": user_id,
                 "locale": "en_US",
-                "role": {"id": "Admin", "name": "Admin"},
+                "role": fixtures.ROLE_ADMIN,
                 "timeZone": "America/Chicago",
-                "userAddress": {
-                    "city": "",
-                    "country": "",
-                    "line": "",
-                    "state": "",
-                    "zipCode": "",
-                },
+                "userAddress": fixtures.EMPTY_ADDRESS,
                 "username": "bpantshat@notreal.com",
                 "verified": True,
             },
@@ -308,3 +206,428 @@ class Page(unittest.TestCase):
         self.assertEqual(users[0].id, user_id)
         self.assertIsInstance(users[0], popsgenie.resource.User)
         self.assertEqual(session.get.call_count, 1)
+
+    def test_params_only_sent_with_first_page(self):
+        """Query parameters are sent with the first request;
+        following pages use the url from paging.next as is
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+        response_1 = Mock(spec_set=['json'])
+        response_1.json.return_value = {
+            "data": [{"id": self.random_id()}],
+            "paging": {
+                "next": "https://api.opsgenie.com/v2/users?limit=1&offset=1",
+            },
+        }
+        response_2 = Mock(spec_set=['json'])
+        response_2.json.return_value = {
+            "data": [{"id": self.random_id()}],
+            "paging": {},
+        }
+        session.get.side_effect = [response_1, response_2]
+
+        connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        pages = popsgenie.tool.Pages(
+            connection,
+            "https://api.opsgenie.com/v2/users",
+            popsgenie.resource.User,
+            params={"offset": 0, "limit": 1},
+        )
+
+        # Act
+        users = list(itertools.chain.from_iterable(pages))
+
+        # Assert
+        self.assertEqual(len(users), 2)
+        self.assertEqual(
+            session.get.call_args_list[0].kwargs, {"params": {"offset": 0, "limit": 1}})
+        self.assertEqual(session.get.call_args_list[1].kwargs, {})
+
+    def test_prefetch_queries_each_object(self):
+        """With prefetch, every object on a page has its attributes
+        queried before the page is returned
+        """
+        # Arrange
+        user_ids = [self.random_id(), self.random_id()]
+        session = Mock(spec_set=['get'])
+
+        def get(url, **kwargs):
+            response = Mock(spec_set=['json'])
+            if url.endswith("/users"):
+                response.json.return_value = {
+                    "data": [{"id": user_id} for user_id in user_ids],
+                }
+            else:
+                response.json.return_value = {
+                    "data": {"id": url.rsplit("/", 1)[-1], "fullName": "Bob McThornton"},
+                }
+            return response
+
+        session.get.side_effect = get
+
+        connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        pages = popsgenie.tool.Pages(
+            connection,
+            "https://api.opsgenie.com/v2/users",
+            popsgenie.resource.User,
+            prefetch=True,
+        )
+
+        # Act
+        users = next(pages)
+
+        # Assert
+        self.assertEqual(session.get.call_count, 3)
+        self.assertEqual([user.fullName for user in users], ["Bob McThornton"] * 2)
+        self.assertEqual(session.get.call_count, 3)
+
+    def test_exhausted_pages_do_not_query_again(self):
+        """Iterating over pages a second time doesn't
+        repeat the queries
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+        response = session.get.return_value
+        response.json.return_value = {
+            "data": [{"id": self.random_id()}],
+            "paging": {},
+        }
+
+        connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        pages = popsgenie.tool.Pages(
+            connection,
+            "https://api.opsgenie.com/v2/users",
+            popsgenie.resource.User,
+        )
+
+        # Act
+        first = list(itertools.chain.from_iterable(pages))
+        second = list(itertools.chain.from_iterable(pages))
+
+        # Assert
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+        self.assertEqual(session.get.call_count, 1)
+
+    def test_reset_queries_again(self):
+        """After reset pages are requested again"""
+        # Arrange
+        session = Mock(spec_set=['get'])
+        response = session.get.return_value
+        response.json.return_value = {
+            "data": [{"id": self.random_id()}],
+            "paging": {},
+        }
+
+        connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        pages = popsgenie.tool.Pages(
+            connection,
+            "https://api.opsgenie.com/v2/users",
+            popsgenie.resource.User,
+        )
+
+        # Act
+        first = list(pages)
+        pages.reset()
+        second = list(pages)
+
+        # Assert
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(session.get.call_count, 2)
+
+    def test_close_stops_paging(self):
+        """Closing pages part way through stops it
+        requesting anything past the page returned
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+        response = session.get.return_value
+        response.json.return_value = {
+            "data": [{"id": self.random_id()}],
+            "paging": {"next": "https://api.opsgenie.com/v2/users?offset=1&limit=1"},
+        }
+
+        connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        pages = popsgenie.tool.Pages(
+            connection,
+            "https://api.opsgenie.com/v2/users",
+            popsgenie.resource.User,
+        )
+
+        # Act
+        next(pages)
+        pages.close()
+
+        # Assert
+        self.assertEqual(list(pages), [])
+        self.assertEqual(session.get.call_count, 1)
+
+    def test_resources_stop_paging_when_caller_stops(self):
+        """Reading resources one at a time, and stopping at
+        the first, doesn't request any page past the first
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+        response = session.get.return_value
+        response.json.return_value = {
+            "data": [{"id": self.random_id()}, {"id": self.random_id()}],
+            "paging": {"next": "https://api.opsgenie.com/v2/users?offset=2&limit=2"},
+        }
+
+        connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        pages = popsgenie.tool.Pages(
+            connection,
+            "https://api.opsgenie.com/v2/users",
+            popsgenie.resource.User,
+        )
+
+        # Act
+        resources = pages.resources()
+        user = next(resources)
+        resources.close()
+
+        # Assert
+        self.assertIsInstance(user, popsgenie.resource.User)
+        self.assertEqual(list(pages), [])
+        self.assertEqual(session.get.call_count, 1)
+
+    def test_single_resource_is_not_paged(self):
+        """A response holding one resource ends paging
+        even if it carries a paging.next url
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+        response = session.get.return_value
+        response.json.return_value = {
+            "data": {"id": self.random_id()},
+            "paging": {"next": "https://api.opsgenie.com/v2/users?offset=1&limit=1"},
+        }
+
+        connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        pages = popsgenie.tool.Pages(
+            connection,
+            "https://api.opsgenie.com/v2/users/bob",
+            popsgenie.resource.User,
+        )
+
+        # Act
+        users = list(pages)
+
+        # Assert
+        self.assertEqual(len(users), 1)
+        self.assertEqual(session.get.call_count, 1)
+
+    def test_parallel_requests_remaining_pages(self):
+        """In parallel, every page up to paging.last is requested
+        once the first page arrives and pages are returned in order
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+
+        def get(url, **kwargs):
+            offset = int(kwargs["params"]["offset"]) if kwargs.get("params") else int(
+                url.split("offset=")[1].split("&")[0])
+            response = Mock(spec_set=['json'])
+            response.json.return_value = {
+                "data": [{"id": f"user-{offset}"}, {"id": f"user-{offset + 1}"}],
+                "paging": {
+                    "next": f"https://api.opsgenie.com/v2/users?limit=2&offset={offset + 2}",
+                    "last": "https://api.opsgenie.com/v2/users?limit=2&offset=4",
+                } if offset < 4 else {
+                    "last": "https://api.opsgenie.com/v2/users?limit=2&offset=4",
+                },
+            }
+            return response
+
+        session.get.side_effect = get
+
+        connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        pages = popsgenie.tool.Pages(
+            connection,
+            "https://api.opsgenie.com/v2/users",
+            popsgenie.resource.User,
+            params={"offset": 0, "limit": 2},
+            parallel=True,
+        )
+
+        # Act
+        users = list(itertools.chain.from_iterable(pages))
+
+        # Assert
+        self.assertEqual(session.get.call_count, 3)
+        self.assertEqual(
+            [user.id for user in users],
+            ["user-0", "user-1", "user-2", "user-3", "user-4", "user-5"])
+
+    def test_parallel_keeps_a_bounded_number_of_pages_in_flight(self):
+        """In parallel, at most PARALLEL_PAGES pages are
+        requested ahead of the caller
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+
+        def get(url, **kwargs):
+            offset = int(kwargs["params"]["offset"]) if kwargs.get("params") else int(
+                url.split("offset=")[1].split("&")[0])
+            response = Mock(spec_set=['json'])
+            response.json.return_value = {
+                "data": [{"id": f"user-{offset}"}],
+                "paging": {
+                    "next": f"https://api.opsgenie.com/v2/users?limit=1&offset={offset + 1}",
+                    "last": "https://api.opsgenie.com/v2/users?limit=1&offset=19",
+                } if offset < 19 else {
+                    "last": "https://api.opsgenie.com/v2/users?limit=1&offset=19",
+                },
+            }
+            return response
+
+        session.get.side_effect = get
+
+        submitted = []
+
+        class Executor(ThreadPoolExecutor):
+            def submit(self, *args, **kwargs):
+                submitted.append(args)
+                return super().submit(*args, **kwargs)
+
+        connection = popsgenie.tool.Connection(session, 'https://api.opsgenie.com/v2')
+
+        pages = popsgenie.tool.Pages(
+            connection,
+            "https://api.opsgenie.com/v2/users",
+            popsgenie.resource.User,
+            params={"offset": 0, "limit": 1},
+            parallel=True,
+        )
+
+        # Act
+        with patch("popsgenie.tool.ThreadPoolExecutor", Executor):
+            next(pages)
+            submitted_ahead = len(submitted)
+            users = list(itertools.chain.from_iterable(pages))
+
+        # Assert
+        self.assertEqual(submitted_ahead, 1 + popsgenie.tool.PARALLEL_PAGES)
+        self.assertEqual([user.id for user in users], [f"user-{offset}" for offset in range(1, 20)])
+        self.assertEqual(session.get.call_count, 20)
+
+
+class MakeSession(unittest.TestCase):
+    def test_session_is_authorized_and_pooled(self):
+        """The session sends the API key and keeps
+        a pool of connections to Opsgenie
+        """
+        # Act
+        session = popsgenie.tool.make_session("api key", pool_maxsize=16)
+
+        # Assert
+        adapter = session.get_adapter("https://api.opsgenie.com/v2/users")
+        self.assertEqual(session.headers["Authorization"], "api key")
+        self.assertEqual(adapter._pool_maxsize, 16)
+        self.assertEqual(adapter.max_retries.total, 3)
+
+
+class Connection(unittest.TestCase):
+    def test_cache_ttl_reuses_response(self):
+        """With cache_ttl set, getting the same url again
+        queries Opsgenie once and hands each hit its own copy
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+        session.get.return_value.json.return_value = {"data": {"id": "user-0"}}
+        connection = popsgenie.tool.Connection(
+            session, "https://api.opsgenie.com/v2", cache_ttl=60)
+        connection.get_json("https://api.opsgenie.com/v2/users/user-0")
+
+        # Act
+        json_1 = connection.get_json("https://api.opsgenie.com/v2/users/user-0")
+        json_1["data"]["id"] = "changed"
+        json_2 = connection.get_json("https://api.opsgenie.com/v2/users/user-0")
+
+        # Assert
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual(json_2, {"data": {"id": "user-0"}})
+
+    def test_unpacks_as_session_and_url_base(self):
+        """Connection still unpacks and indexes like the
+        (session, url_base) namedtuple it used to be
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+        connection = popsgenie.tool.Connection(
+            session, "https://api.opsgenie.com/v2", cache_ttl=60)
+
+        # Act
+        unpacked_session, url_base = connection
+
+        # Assert
+        self.assertIs(unpacked_session, session)
+        self.assertEqual(url_base, "https://api.opsgenie.com/v2")
+        self.assertIs(connection[0], session)
+        self.assertEqual(connection.cache_ttl, 60)
+
+    def test_replace_keeps_cache_settings(self):
+        """_replace, and _make, build a working Connection
+        rather than one missing its cache
+        """
+        # Arrange
+        session = Mock(spec_set=['get'])
+        session.get.return_value.json.return_value = {"data": {"id": "user-0"}}
+        connection = popsgenie.tool.Connection(
+            session, "https://api.opsgenie.com/v2", cache_ttl=60)
+
+        # Act
+        replaced = connection._replace(url_base="https://api.eu.opsgenie.com/v2")
+        made = popsgenie.tool.Connection._make([session, "https://api.opsgenie.com/v2"])
+        replaced.get_json("https://api.eu.opsgenie.com/v2/users/user-0")
+        replaced.get_json("https://api.eu.opsgenie.com/v2/users/user-0")
+        made.get_json("https://api.opsgenie.com/v2/users/user-0")
+
+        # Assert
+        self.assertEqual(replaced.url_base, "https://api.eu.opsgenie.com/v2")
+        self.assertEqual(replaced.cache_ttl, 60)
+        self.assertEqual(made.cache_ttl, 0)
+        self.assertEqual(session.get.call_count, 2)
+
+    def test_no_cache_by_default(self):
+        """Without cache_ttl every get_json queries Opsgenie"""
+        # Arrange
+        session = Mock(spec_set=['get'])
+        session.get.return_value.json.return_value = {"data": {"id": "user-0"}}
+        connection = popsgenie.tool.Connection(session, "https://api.opsgenie.com/v2")
+
+        # Act
+        connection.get_json("https://api.opsgenie.com/v2/users/user-0")
+        connection.get_json("https://api.opsgenie.com/v2/users/user-0")
+
+        # Assert
+        self.assertEqual(session.get.call_count, 2)
+
+
+class OrjsonHook(unittest.TestCase):
+    @unittest.skipIf(popsgenie.tool.orjson is None, "orjson is not installed")
+    def test_response_json_decoded_by_orjson(self):
+        """After the hook runs response.json() decodes
+        the response's content
+        """
+        # Arrange
+        response = Mock(spec_set=['content', 'json'])
+        response.content = b'{"data": {"id": "cza5093-fbc7-4533-96e5-510f67b5025f"}}'
+
+        # Act
+        popsgenie.tool.orjson_hook(response)
+
+        # Assert
+        self.assertEqual(
+            response.json(), {"data": {"id": "cza5093-fbc7-4533-96e5-510f67b5025f"}})
+